@@ -23,12 +23,13 @@ import uuid
 import json
 import asyncio
 from contextlib import asynccontextmanager
+from typing import Any
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 
 from config.settings import get_settings
-from managers.chatbot_manager_new import get_chatbot_manager
+from managers.chatbot_manager_new import get_chatbot_manager, peek_chatbot_manager
 from api.endpoints_new import router
 from utils.error_handlers import (
     api_error_handler,
@@ -37,6 +38,25 @@ from utils.error_handlers import (
     APIError,
 )
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(value: Any) -> str:
+    """Serialize a WebSocket payload, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value)
+
+
+def _loads(text: str) -> Any:
+    """Parse a WebSocket message; orjson errors subclass json.JSONDecodeError."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -74,18 +94,34 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("Shutting down LegalMind API...")
     
+    # Only clean up a manager that exists; get_chatbot_manager() would build
+    # one (and init Vertex AI) just to tear it down if startup failed
+    chatbot = peek_chatbot_manager()
+    
     # Clean up chat sessions
     try:
-        chatbot = get_chatbot_manager()
-        await asyncio.wait_for(
-            chatbot.cleanup_old_sessions(max_age_minutes=0),
-            timeout=5.0
-        )
+        if chatbot is not None:
+            await asyncio.wait_for(
+                chatbot.cleanup_old_sessions(max_age_minutes=0),
+                timeout=5.0
+            )
     except asyncio.TimeoutError:
         print("⚠️ Session cleanup timed out")
     except Exception as e:
         print(f"⚠️ Cleanup error: {e}")
-    
+
+    # Shut down the Gemini I/O thread pool, letting in-flight calls finish
+    try:
+        if chatbot is not None:
+            await asyncio.wait_for(
+                asyncio.to_thread(chatbot.gemini.close),
+                timeout=5.0
+            )
+    except asyncio.TimeoutError:
+        print("⚠️ Gemini executor shutdown timed out")
+    except Exception as e:
+        print(f"⚠️ Gemini shutdown error: {e}")
+
     await asyncio.sleep(0.5)
     print("Shutdown complete")
 
@@ -166,7 +202,7 @@ async def websocket_chat(websocket: WebSocket):
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = _loads(data)
             
             # Get or create session ID
             session_id = message_data.get("session_id")
@@ -177,7 +213,7 @@ async def websocket_chat(websocket: WebSocket):
             contract_id = message_data.get("contract_id")
             
             # Send acknowledgment
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "ack",
                 "session_id": session_id,
                 "status": "processing",
@@ -191,7 +227,7 @@ async def websocket_chat(websocket: WebSocket):
             )
             
             # Send response
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "response",
                 **response,
             }))
@@ -201,7 +237,7 @@ async def websocket_chat(websocket: WebSocket):
     except json.JSONDecodeError as e:
         print(f"Invalid JSON received: {e}")
         try:
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "error",
                 "error": "Invalid JSON format",
             }))
@@ -210,7 +246,7 @@ async def websocket_chat(websocket: WebSocket):
     except Exception as e:
         print(f"WebSocket error: {e}")
         try:
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "error",
                 "error": str(e),
             }))
@@ -229,21 +265,21 @@ async def websocket_workflow(websocket: WebSocket):
     try:
         # Receive workflow request
         data = await websocket.receive_text()
-        request = json.loads(data)
+        request = _loads(data)
         
         session_id = request.get("session_id", str(uuid.uuid4()))
         workflow_name = request.get("workflow_name")
         contract_id = request.get("contract_id")
         
         if not workflow_name or not contract_id:
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "error",
                 "error": "workflow_name and contract_id are required",
             }))
             return
         
         # Send start notification
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(_dumps({
             "type": "start",
             "workflow": workflow_name,
             "contract_id": contract_id,
@@ -256,7 +292,7 @@ async def websocket_workflow(websocket: WebSocket):
         
         template = get_workflow_template(workflow_name)
         if not template:
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "error",
                 "error": f"Unknown workflow: {workflow_name}",
             }))
@@ -271,7 +307,7 @@ async def websocket_workflow(websocket: WebSocket):
         
         for i, agent_name in enumerate(template["agents"]):
             # Send progress update
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "progress",
                 "agent": agent_name,
                 "step": i + 1,
@@ -305,7 +341,7 @@ async def websocket_workflow(websocket: WebSocket):
             })
             
             # Send agent completion
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "agent_complete",
                 "agent": agent_config["name"],
                 "agent_id": agent_name,
@@ -315,7 +351,7 @@ async def websocket_workflow(websocket: WebSocket):
             }))
         
         # Send completion
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(_dumps({
             "type": "complete",
             "workflow": workflow_name,
             "results": results,
@@ -326,7 +362,7 @@ async def websocket_workflow(websocket: WebSocket):
     except Exception as e:
         print(f"Workflow WebSocket error: {e}")
         try:
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "error",
                 "error": str(e),
             }))
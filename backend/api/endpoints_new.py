@@ -581,6 +581,70 @@ async def get_contract_clauses(contract_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Last line of a streamed summary that failed after the first chunk was sent
+_STREAM_ERROR_MARKER = "\n\n[ERROR] Summary generation failed before completion.\n"
+
+
+@router.get("/contracts/{contract_id}/summary/stream")
+async def stream_contract_summary(
+    contract_id: str,
+    http_request: Request,
+    max_length: Optional[int] = None,
+):
+    """Stream a plain-text summary of a contract as it is generated.
+    
+    Args:
+        contract_id: The contract ID
+        max_length: Optional approximate summary length in words
+        
+    Returns:
+        Streaming text/plain response; if generation fails after streaming
+        has started, the body ends with _STREAM_ERROR_MARKER
+    """
+    _rate_limit_check(http_request, "chat")
+    firestore = FirestoreService()
+    contract = await firestore.get_contract(contract_id)
+    if contract is None:
+        raise HTTPException(status_code=404, detail=f"Contract {contract_id} not found")
+    
+    content = contract.get("content")
+    if not content:
+        result = await extract_contract_text(contract_id)
+        if result.get("status") != "success":
+            raise HTTPException(
+                status_code=500,
+                detail=result.get("message", "Contract text unavailable"),
+            )
+        content = result["content"]
+    
+    # Share the chatbot's service (and its Vertex channel and model cache)
+    gemini = get_chatbot_manager().gemini
+    stream = gemini.summarize_stream(content, max_length=max_length)
+    
+    # Wait for the first chunk so failures before any output still get a
+    # proper error status instead of an empty 200
+    try:
+        first = await anext(stream)
+    except StopAsyncIteration:
+        first = ""
+    except Exception as e:
+        logger.error("Summary stream for %s failed: %s", contract_id, e)
+        raise HTTPException(status_code=500, detail=f"Summary generation failed: {e}")
+    
+    async def _body():
+        yield first
+        try:
+            async for chunk in stream:
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; end with a marker so the client can
+            # tell a failed summary from a finished one
+            logger.error("Summary stream for %s failed: %s", contract_id, e)
+            yield _STREAM_ERROR_MARKER
+    
+    return StreamingResponse(_body(), media_type="text/plain; charset=utf-8")
+
+
 # =============================================================================
 # Workflow Endpoints
 # =============================================================================
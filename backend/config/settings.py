@@ -55,12 +55,19 @@ class Settings(BaseSettings):
     # Session Configuration
     session_timeout_minutes: int = 60
     max_tokens_per_request: int = 8192
+    gemini_max_input_tokens: int = 1_000_000
     
     # Rate Limiting
     rate_limit_requests_per_minute: int = 30
+    gemini_max_concurrency: int = 50
+    tool_max_workers: int = 16
+    gemini_io_max_workers: int = 64
+    gemini_requests_per_minute: int = 0  # Client-side pacing; 0 disables
 
     # Caching
     response_cache_ttl_seconds: int = 60
+    enable_semantic_cache: bool = False  # Requires numpy (optional dependency)
+    semantic_cache_threshold: float = 0.95
     
     # -------------------------------------------------------------------------
     # Feature Flags
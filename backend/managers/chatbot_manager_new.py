@@ -763,3 +763,12 @@ def get_chatbot_manager() -> ChatbotManager:
     if _chatbot_manager is None:
         _chatbot_manager = ChatbotManager()
     return _chatbot_manager
+
+
+def peek_chatbot_manager() -> Optional[ChatbotManager]:
+    """Get the global ChatbotManager only if it has already been created.
+    
+    Returns:
+        ChatbotManager instance, or None
+    """
+    return _chatbot_manager
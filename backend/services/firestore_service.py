@@ -5,6 +5,8 @@ Handles all interactions with Google Cloud Firestore.
 
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.api_core import exceptions as google_exceptions
+from google.api_core.retry import Retry, if_exception_type
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import asyncio
@@ -14,9 +16,29 @@ from functools import lru_cache
 from config.settings import get_settings
 
 
+# Retry batch commits on transient errors, staying inside the 10s
+# wait_for used around each commit
+_COMMIT_RETRY = Retry(
+    predicate=if_exception_type(
+        google_exceptions.Aborted,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.TooManyRequests,
+    ),
+    initial=0.25,
+    multiplier=2.0,
+    maximum=2.0,
+    timeout=8.0,
+)
+
+
 class FirestoreService:
     """Service for interacting with Firestore."""
     
+    # Firestore caps a single commit at 500 writes
+    MAX_WRITES_PER_COMMIT = 500
+    
     # Collection names
     CONTRACTS = "contracts"
     CLAUSES = "clauses"
@@ -279,6 +301,85 @@ class FirestoreService:
         }
         return await self.update_document(self.CONTRACTS, contract_id, update_data)
     
+    async def save_clauses(
+        self,
+        contract_id: str,
+        clauses: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Write clauses and link them to their contract.
+        
+        When the clauses and the contract update fit in one commit
+        (MAX_WRITES_PER_COMMIT), they are written atomically. Larger sets
+        are written in batches of clauses with the contract update last, so
+        the contract never links to clauses that were not stored. Each
+        commit is retried on transient errors.
+        
+        Args:
+            contract_id: Parent contract ID
+            clauses: Clause dicts (clause_type, content, section_number, ...)
+            
+        Returns:
+            List of clause IDs, in input order
+            
+        Raises:
+            asyncio.TimeoutError: If a commit does not finish in time
+        """
+        clauses_ref = self.client.collection(self.CLAUSES)
+        writes = []
+        clause_ids = []
+        for clause in clauses:
+            clause_id = clause.get("id") or uuid.uuid4().hex
+            clause_ids.append(clause_id)
+            writes.append((clauses_ref.document(clause_id), {
+                "contract_id": contract_id,
+                "clause_type": clause.get("clause_type", "general"),
+                "content": clause.get("content", ""),
+                "section_number": clause.get("section_number"),
+                "risk_level": clause.get("risk_level") or "low",
+                "risk_explanation": clause.get("risk_explanation"),
+                "compliance_issues": clause.get("compliance_issues") or [],
+                "recommendations": clause.get("recommendations") or [],
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            }))
+        
+        contract_ref = self.client.collection(self.CONTRACTS).document(contract_id)
+        contract_data = {
+            "clauses": clause_ids,
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }
+        
+        @_COMMIT_RETRY
+        def _commit(group, include_contract):
+            # A fresh batch per attempt; a committed batch can't be reused
+            batch = self.client.batch()
+            for doc_ref, data in group:
+                batch.set(doc_ref, data)
+            if include_contract:
+                batch.update(contract_ref, contract_data)
+            batch.commit()
+        
+        async def _run(group, include_contract) -> None:
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(_commit, group, include_contract),
+                    timeout=10.0
+                )
+            except asyncio.TimeoutError:
+                print(f"⚠️ Firestore timeout writing clauses for {self.CONTRACTS}/{contract_id}")
+                raise
+        
+        step = self.MAX_WRITES_PER_COMMIT
+        if len(writes) < step:
+            await _run(writes, True)
+            return clause_ids
+        
+        for start in range(0, len(writes), step):
+            await _run(writes[start:start + step], False)
+        await _run([], True)
+        
+        return clause_ids
+    
     async def list_contracts(
         self,
         status: Optional[str] = None,
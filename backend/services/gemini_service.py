@@ -44,35 +44,96 @@ except ImportError:
                 def __init__(self, **kwargs):
                     for k, v in kwargs.items():
                         setattr(self, k, v)
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Iterable, Set, Tuple, AsyncIterator
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import functools
+import hashlib
 import json
 import asyncio
+import logging
 import os
-from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from config.settings import get_settings
 
+logger = logging.getLogger(__name__)
+
+
+def _json_loads(text: str) -> Any:
+    """Parse a JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _parts(response) -> Any:
+    """Get the parts of a response's first candidate, or () if it has none."""
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return ()
+    return getattr(candidates[0].content, "parts", None) or ()
+
+
+# Marker placed where the middle of an oversized document was cut
+_TRUNCATION_MARKER = "\n...[TRUNCATED]...\n"
+
+
+def _truncate_middle(text: str, max_chars: int) -> str:
+    """Keep the head and tail of text within max_chars, dropping the middle.
+    
+    Contracts front-load parties and definitions and end with signatures and
+    termination terms, so both ends are kept rather than just the start.
+    """
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= len(_TRUNCATION_MARKER):
+        # No room for the marker; a plain cut is the best that fits
+        return text[:max(max_chars, 0)]
+    keep = max_chars - len(_TRUNCATION_MARKER)
+    head = keep // 2
+    return text[:head] + _TRUNCATION_MARKER + text[len(text) - (keep - head):]
+
 
 # ============================================================================
 # Schema Conversion Helpers
 # ============================================================================
 
-def _convert_json_schema_to_vertex(schema: Dict[str, Any]) -> Optional[Schema]:
+# JSON Schema type name -> Vertex AI Type; Type is resolved at import above
+_VERTEX_TYPE_MAP: Dict[str, Any] = {
+    "object": Type.OBJECT,
+    "string": Type.STRING,
+    "number": Type.NUMBER,
+    "integer": Type.INTEGER,
+    "boolean": Type.BOOLEAN,
+    "array": Type.ARRAY,
+}
+
+
+def _content_key(value: Any) -> Optional[bytes]:
+    """Hash JSON content canonically; None if it isn't JSON-serializable."""
+    try:
+        if orjson is not None:
+            canonical = orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+        else:
+            canonical = json.dumps(value, sort_keys=True).encode()
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(canonical, digest_size=16).digest()
+
+
+def _convert_json_schema_to_vertex_uncached(schema: Dict[str, Any]) -> Optional[Schema]:
     """Convert JSON Schema format to Vertex AI Schema objects."""
     if not isinstance(schema, dict):
         return schema
 
-    type_mapping = {
-        "object": Type.OBJECT,
-        "string": Type.STRING,
-        "number": Type.NUMBER,
-        "integer": Type.INTEGER,
-        "boolean": Type.BOOLEAN,
-        "array": Type.ARRAY,
-    }
-
     try:
-        schema_type = type_mapping.get(schema.get("type", "string"), Type.STRING)
+        schema_type = _VERTEX_TYPE_MAP.get(schema.get("type", "string"), Type.STRING)
         properties = None
         items = None
 
@@ -80,14 +141,14 @@ def _convert_json_schema_to_vertex(schema: Dict[str, Any]) -> Optional[Schema]:
             properties = {}
             for k, v in schema["properties"].items():
                 if v is not None and isinstance(v, dict):
-                    converted = _convert_json_schema_to_vertex(v)
+                    converted = _convert_json_schema_to_vertex_uncached(v)
                     if converted is not None:
                         properties[k] = converted
             if not properties:
                 properties = None
 
         if schema.get("items") and isinstance(schema["items"], dict):
-            items = _convert_json_schema_to_vertex(schema["items"])
+            items = _convert_json_schema_to_vertex_uncached(schema["items"])
 
         # Build kwargs dict, only including non-None values to avoid
         # pydantic "extra inputs" validation errors in newer SDK versions
@@ -105,15 +166,63 @@ def _convert_json_schema_to_vertex(schema: Dict[str, Any]) -> Optional[Schema]:
 
         return Schema(**kwargs)
     except Exception as e:
-        print(f"⚠️ Error converting schema for Vertex AI: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning("Error converting schema for Vertex AI: %s", e, exc_info=True)
         return None
 
 
-def _build_vertex_tools(tools: List[Dict[str, Any]]) -> List[Tool]:
+# Converted Schema objects keyed by a hash of the JSON schema, in LRU order.
+# Shared between tools and must not be mutated.
+_VERTEX_SCHEMA_CACHE: "OrderedDict[bytes, Schema]" = OrderedDict()
+_VERTEX_SCHEMA_CACHE_SIZE = 256
+
+
+def _convert_json_schema_to_vertex(schema: Dict[str, Any]) -> Optional[Schema]:
+    """Convert JSON Schema to a Vertex AI Schema, memoized on schema content.
+    
+    Failed conversions (None) are not cached.
+    """
+    if not isinstance(schema, dict):
+        return schema
+    key = _content_key(schema)
+    if key is None:
+        return _convert_json_schema_to_vertex_uncached(schema)
+    result = _VERTEX_SCHEMA_CACHE.get(key)
+    if result is not None:
+        _VERTEX_SCHEMA_CACHE.move_to_end(key)
+        return result
+    result = _convert_json_schema_to_vertex_uncached(schema)
+    if result is not None:
+        _VERTEX_SCHEMA_CACHE[key] = result
+        if len(_VERTEX_SCHEMA_CACHE) > _VERTEX_SCHEMA_CACHE_SIZE:
+            _VERTEX_SCHEMA_CACHE.popitem(last=False)
+    return result
+
+
+# Built Tool objects keyed by a hash of the tool definition, in LRU order.
+# Shared between callers and must not be mutated.
+_VERTEX_TOOL_CACHE: "OrderedDict[bytes, Tool]" = OrderedDict()
+_VERTEX_TOOL_CACHE_SIZE = 256
+
+# Upper bound on tool-carrying GenerativeModel instances kept per service (LRU)
+_MODEL_CACHE_SIZE = 32
+
+# Tool-definition fields sent to the model; anything else (e.g. handler) is local
+_DECLARATION_KEYS = ("name", "description", "parameters")
+
+
+def _tool_key(tool: Dict[str, Any]) -> Optional[bytes]:
+    """Hash a tool's declaration fields; None if they aren't JSON-serializable."""
+    return _content_key(
+        {field: tool[field] for field in _DECLARATION_KEYS if field in tool}
+    )
+
+
+def _build_vertex_tools(tools: Iterable[Dict[str, Any]]) -> List[Tool]:
     """Build Vertex AI Tool objects from tool definitions.
     
+    Each definition is converted once; repeats are served from
+    _VERTEX_TOOL_CACHE by content hash.
+    
     Args:
         tools: List of tool definitions
         
@@ -123,12 +232,19 @@ def _build_vertex_tools(tools: List[Dict[str, Any]]) -> List[Tool]:
     try:
         vertex_tools = []
         for tool in tools:
+            key = _tool_key(tool)
+            cached = _VERTEX_TOOL_CACHE.get(key) if key is not None else None
+            if cached is not None:
+                _VERTEX_TOOL_CACHE.move_to_end(key)
+                vertex_tools.append(cached)
+                continue
+            
             parameters = None
             if "parameters" in tool:
                 parameters = _convert_json_schema_to_vertex(tool["parameters"])
                 if parameters is None:
                     # Schema conversion failed, skip this tool
-                    print(f"⚠️ Skipping tool {tool['name']} due to schema conversion error")
+                    logger.warning("Skipping tool %s due to schema conversion error", tool["name"])
                     continue
 
             func_decl = FunctionDeclaration(
@@ -136,14 +252,137 @@ def _build_vertex_tools(tools: List[Dict[str, Any]]) -> List[Tool]:
                 description=tool.get("description"),
                 parameters=parameters,
             )
-            vertex_tools.append(Tool(function_declarations=[func_decl]))
+            vertex_tool = Tool(function_declarations=[func_decl])
+            if key is not None:
+                _VERTEX_TOOL_CACHE[key] = vertex_tool
+                if len(_VERTEX_TOOL_CACHE) > _VERTEX_TOOL_CACHE_SIZE:
+                    _VERTEX_TOOL_CACHE.popitem(last=False)
+            vertex_tools.append(vertex_tool)
 
         return vertex_tools
     except Exception as e:
-        print(f"❌ Error building Vertex AI tools: {e}")
+        logger.error("Error building Vertex AI tools: %s", e)
         return []
 
 
+# Output cap for every generation config; prompts leave room for this much
+_MAX_OUTPUT_TOKENS = 8192
+
+# GenerationConfig per temperature; configs are immutable once sent, so one
+# instance serves every request at that temperature
+_GEN_CONFIG_CACHE: Dict[float, GenerationConfig] = {}
+_GEN_CONFIG_CACHE_SIZE = 64
+
+
+def _generation_config(temperature: float) -> GenerationConfig:
+    """Get the shared GenerationConfig for a temperature."""
+    config = _GEN_CONFIG_CACHE.get(temperature)
+    if config is None:
+        config = GenerationConfig(
+            temperature=temperature,
+            top_p=0.95,
+            top_k=40,
+            max_output_tokens=_MAX_OUTPUT_TOKENS,
+        )
+        if len(_GEN_CONFIG_CACHE) >= _GEN_CONFIG_CACHE_SIZE:
+            _GEN_CONFIG_CACHE.clear()
+        _GEN_CONFIG_CACHE[temperature] = config
+    return config
+
+
+# Coalescing window and size for generate_text(batch=True)
+_BATCH_MAX_SIZE = 8
+_BATCH_MAX_WAIT = 0.02
+# Longer prompts gain little from sharing a round trip and risk the context limit
+_BATCH_MAX_PROMPT_CHARS = 8_000
+# Structured output for a coalesced request: one answer string per task
+_BATCH_RESPONSE_SCHEMA = {"type": "array", "items": {"type": "string"}}
+_BATCH_GEN_CONFIG: Optional[GenerationConfig] = None
+
+
+def _batch_generation_config() -> GenerationConfig:
+    """Get the shared JSON-array GenerationConfig for coalesced requests."""
+    global _BATCH_GEN_CONFIG
+    if _BATCH_GEN_CONFIG is None:
+        _BATCH_GEN_CONFIG = GenerationConfig(
+            temperature=GeminiService.DEFAULT_TEMPERATURE,
+            top_p=0.95,
+            top_k=40,
+            max_output_tokens=_MAX_OUTPUT_TOKENS,
+            response_mime_type="application/json",
+            response_schema=_BATCH_RESPONSE_SCHEMA,
+        )
+    return _BATCH_GEN_CONFIG
+
+
+class _PromptBatcher:
+    """Coalesce concurrent prompts into shared requests.
+    
+    Prompts submitted within max_wait of each other, up to max_size, are
+    handed to dispatch together; dispatch returns one answer per prompt.
+    """
+    
+    __slots__ = ("_dispatch", "_max_size", "_max_wait", "_pending", "_timer", "_tasks")
+    
+    def __init__(
+        self,
+        dispatch: Callable,
+        max_size: int = _BATCH_MAX_SIZE,
+        max_wait: float = _BATCH_MAX_WAIT,
+    ):
+        self._dispatch = dispatch
+        self._max_size = max_size
+        self._max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Strong references to running dispatches until they finish
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def submit(self, prompt: str) -> "asyncio.Future[str]":
+        """Queue a prompt; the returned future resolves to its answer."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        if len(self._pending) >= self._max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+        return future
+    
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            answers = await self._dispatch([prompt for prompt, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled or interrupted: don't leave submitters waiting forever
+            for _, future in batch:
+                future.cancel()
+            raise
+        for (_, future), answer in zip(batch, answers):
+            if not future.done():
+                future.set_result(answer)
+        # A short answer list must not strand the remaining submitters
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(
+                    RuntimeError(f"Batched request returned {len(answers)} answers for {len(batch)} prompts")
+                )
+
+
 class GeminiService:
     """Service for interacting with Google Vertex AI Generative Models.
     
@@ -151,21 +390,40 @@ class GeminiService:
     All requests are authenticated via service account credentials.
     """
     
+    __slots__ = (
+        "settings",
+        "_model",
+        "_plain_models",
+        "_tools_models",
+        "_tools",
+        "_tool_declarations",
+        "_vertex_tools_cache",
+        "_executor",
+        "_sem",
+        "_batcher",
+    )
+    
+    # Default generation settings, built once and shared by every request
+    DEFAULT_TEMPERATURE = 0.7
+    DEFAULT_GEN_CONFIG = _generation_config(DEFAULT_TEMPERATURE)
+    
     def __init__(self):
         """Initialize the Gemini service with Vertex AI."""
         self.settings = get_settings()
-        print(f"🔍 GeminiService: Initializing with Vertex AI only")
-        print(f"   Project: {self.settings.google_cloud_project}")
-        print(f"   Model: {self.settings.gemini_model}")
+        logger.info(
+            "GeminiService: initializing with Vertex AI only (project: %s, model: %s)",
+            self.settings.google_cloud_project,
+            self.settings.gemini_model,
+        )
         
         try:
             vertexai.init(
                 project=self.settings.google_cloud_project,
                 location="us-central1"
             )
-            print(f"✅ Vertex AI initialized successfully")
+            logger.info("Vertex AI initialized successfully")
         except Exception as e:
-            print(f"❌ Failed to initialize Vertex AI: {e}")
+            logger.error("Failed to initialize Vertex AI: %s", e)
             raise RuntimeError(
                 f"Vertex AI initialization failed: {e}. "
                 "Ensure the service account has 'roles/aiplatform.user' permission "
@@ -173,8 +431,53 @@ class GeminiService:
             ) from e
         
         self._model = None
+        # Tool-less models keyed by model name, for per-call config overrides
+        self._plain_models: Dict[str, GenerativeModel] = {}
+        # (model, system instruction, tool hashes, grounding) -> model, in
+        # LRU order; generation config is sent per request instead
+        self._tools_models: "OrderedDict[tuple, GenerativeModel]" = OrderedDict()
         self._tools: Dict[str, Callable] = {}
-        self._tool_declarations: List[Dict] = []
+        # Tool name -> declaration, in registration order
+        self._tool_declarations: Dict[str, Dict] = {}
+        # Built Vertex tools for _tool_declarations, reset by register_tool
+        self._vertex_tools_cache: Optional[List[Tool]] = None
+        # I/O pool for blocking SDK calls; created on first use, which only
+        # happens if a model lacks generate_content_async
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Bounds in-flight requests issued by generate_text_batch
+        self._sem = asyncio.Semaphore(self.settings.gemini_max_concurrency or 50)
+        # Coalesces generate_text(batch=True) calls; created on first use
+        self._batcher: Optional[_PromptBatcher] = None
+    
+    async def _run_blocking(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking SDK call on the service's I/O thread pool.
+        
+        The caller's contextvars are carried into the worker, as with
+        asyncio.to_thread.
+        """
+        if self._executor is None:
+            # Blocking SDK calls are HTTP-bound, so size this pool for I/O
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.settings.gemini_io_max_workers or 64,
+                thread_name_prefix="gemini",
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(contextvars.copy_context().run, func, *args, **kwargs),
+        )
+    
+    async def _generate(self, model: GenerativeModel, contents: Any, **kwargs) -> Any:
+        """Call the model's native async API, falling back to the I/O pool."""
+        if hasattr(model, "generate_content_async"):
+            return await model.generate_content_async(contents, **kwargs)
+        return await self._run_blocking(model.generate_content, contents, **kwargs)
+    
+    def close(self) -> None:
+        """Shut down the I/O thread pool, if one was created, waiting for in-flight calls."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
     
     @property
     def model(self) -> GenerativeModel:
@@ -184,32 +487,31 @@ class GeminiService:
             Initialized GenerativeModel instance
         """
         if self._model is None:
-            # Build generation config for Vertex AI
-            generation_config = GenerationConfig(
-                temperature=0.7,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,
-            )
-            
             # Create model kwargs
             model_kwargs = {
                 "model_name": self.settings.gemini_model,
-                "generation_config": generation_config,
+                "generation_config": self.DEFAULT_GEN_CONFIG,
             }
             
             # Add tools if registered
             if self._tool_declarations:
-                vertex_tools = _build_vertex_tools(self._tool_declarations)
+                vertex_tools = self._get_vertex_tools()
                 if vertex_tools:
                     model_kwargs["tools"] = vertex_tools
             
             # Create and cache the model
             self._model = GenerativeModel(**model_kwargs)
-            print(f"✅ GenerativeModel created and cached")
+            logger.debug("GenerativeModel created and cached")
         
         return self._model
     
+    def _get_plain_model(self, model_name: str) -> GenerativeModel:
+        """Get a cached GenerativeModel without tools for the given model name."""
+        model = self._plain_models.get(model_name)
+        if model is None:
+            model = self._plain_models[model_name] = GenerativeModel(model_name=model_name)
+        return model
+    
     def register_tool(
         self,
         func: Callable,
@@ -240,44 +542,127 @@ class GeminiService:
         if parameters:
             tool_declaration["parameters"] = parameters
         
-        self._tool_declarations.append(tool_declaration)
-        print(f"✅ Tool registered: {tool_name}")
+        replaced = tool_name in self._tool_declarations
+        self._tool_declarations[tool_name] = tool_declaration
+        logger.debug("Tool registered: %s", tool_name)
         
-        # Reset cached model to rebuild with new tool
+        # Compile the SDK Tool now so requests never convert schemas; the
+        # default model is rebuilt to pick it up
+        if self._vertex_tools_cache is None or replaced:
+            self._vertex_tools_cache = _build_vertex_tools(self._tool_declarations.values())
+        else:
+            self._vertex_tools_cache = [
+                *self._vertex_tools_cache, *_build_vertex_tools([tool_declaration])
+            ]
         self._model = None
+        self._tools_models.clear()
+    
+    def _get_vertex_tools(self) -> List[Tool]:
+        """Get Vertex AI Tool objects for the registered tools (cached)."""
+        if self._vertex_tools_cache is None:
+            self._vertex_tools_cache = _build_vertex_tools(self._tool_declarations.values())
+        return self._vertex_tools_cache
+    
+    def _get_tools_model(
+        self,
+        system_instruction: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        use_search_grounding: bool = False,
+    ) -> GenerativeModel:
+        """Get a cached model for a system instruction and tool set.
+        
+        Registered tools are always included; caller definitions that share
+        a registered name are dropped. Models are keyed by content hash, so
+        repeat requests skip tool conversion and model construction.
+        
+        Args:
+            system_instruction: Optional system instruction
+            tools: Optional list of tool definitions
+            use_search_grounding: Whether to add Google Search grounding
+            
+        Returns:
+            GenerativeModel carrying the requested tools
+        """
+        tool_keys: tuple = ()
+        if tools:
+            registered = self._tool_declarations
+            tools = [tool for tool in tools if tool.get("name") not in registered]
+            tool_keys = tuple(_tool_key(tool) for tool in tools)
+        key = None
+        if None not in tool_keys:
+            key = (self.settings.gemini_model, system_instruction, tool_keys, use_search_grounding)
+            model = self._tools_models.get(key)
+            if model is not None:
+                self._tools_models.move_to_end(key)
+                return model
+        
+        model_kwargs: Dict[str, Any] = {"model_name": self.settings.gemini_model}
+        if system_instruction:
+            model_kwargs["system_instruction"] = system_instruction
+        
+        # Caller tools first, then the registered set (already compiled)
+        model_tools = _build_vertex_tools(tools) if tools else []
+        if self._tool_declarations:
+            model_tools.extend(self._get_vertex_tools())
+        
+        # Add Google Search grounding if enabled
+        if use_search_grounding and GoogleSearchRetrieval is not None:
+            try:
+                model_tools.append(Tool(google_search_retrieval=GoogleSearchRetrieval()))
+            except Exception as e:
+                logger.warning("GoogleSearchRetrieval not available: %s", e)
+        
+        if model_tools:
+            model_kwargs["tools"] = model_tools
+        
+        model = GenerativeModel(**model_kwargs)
+        if key is not None:
+            self._tools_models[key] = model
+            if len(self._tools_models) > _MODEL_CACHE_SIZE:
+                self._tools_models.popitem(last=False)
+        return model
     
-    async def generate_text(self, prompt: str, temperature: Optional[float] = None) -> str:
+    async def generate_text(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        batch: bool = False,
+    ) -> str:
         """Generate text response from Vertex AI.
         
         Args:
             prompt: Input prompt
             temperature: Optional temperature override (0.0-1.0)
+            batch: Share one request with other batch=True calls arriving
+                within a few milliseconds. Trades a little latency for fewer
+                round trips; ignored for long prompts, a temperature override,
+                or once tools are registered (a batched request is JSON-only
+                and can't call tools, unlike self.model)
             
         Returns:
             Generated text response
         """
+        if (
+            batch
+            and temperature is None
+            and not self._tool_declarations
+            and len(prompt) <= _BATCH_MAX_PROMPT_CHARS
+        ):
+            if self._batcher is None:
+                self._batcher = _PromptBatcher(self._generate_text_group)
+            return await self._batcher.submit(prompt)
+        
         try:
-            # Get or create model
-            model = self.model
-            
-            # Override temperature if provided
+            # Override temperature if provided; the model is reused and the
+            # config is sent with the request
             if temperature is not None:
-                generation_config = GenerationConfig(
-                    temperature=temperature,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=8192,
-                )
-                model = GenerativeModel(
-                    model_name=self.settings.gemini_model,
-                    generation_config=generation_config,
+                generation_config = _generation_config(temperature)
+                model = self._get_plain_model(self.settings.gemini_model)
+                response = await self._generate(
+                    model, prompt, generation_config=generation_config
                 )
-            
-            # Generate content
-            response = await asyncio.to_thread(
-                model.generate_content,
-                prompt
-            )
+            else:
+                response = await self._generate(self.model, prompt)
             
             # Extract and return text
             if response.text:
@@ -286,16 +671,123 @@ class GeminiService:
                 return "No response generated"
                 
         except Exception as e:
-            print(f"❌ Error in generate_text: {e}")
+            logger.error("Error in generate_text: %s", e)
+            raise
+    
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Stream a text response from Vertex AI as it is generated.
+        
+        Uses a model without tools, since there is no tool loop to answer
+        function calls mid-stream.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Optional temperature override (0.0-1.0)
+            
+        Yields:
+            Text deltas in order
+        """
+        model = self._get_plain_model(self.settings.gemini_model)
+        generation_config = (
+            self.DEFAULT_GEN_CONFIG if temperature is None else _generation_config(temperature)
+        )
+        if not hasattr(model, "generate_content_async"):
+            # SDK without async streaming: fall back to the whole response
+            yield await self.generate_text(prompt, temperature=temperature)
+            return
+        
+        try:
+            responses = await model.generate_content_async(
+                prompt, generation_config=generation_config, stream=True
+            )
+            async for chunk in responses:
+                try:
+                    text = chunk.text
+                except (ValueError, AttributeError):
+                    # Chunks without text (safety or finish metadata)
+                    continue
+                if text:
+                    yield text
+        except Exception as e:
+            logger.error("Error in generate_text_stream: %s", e)
             raise
     
+    async def _generate_text_group(self, prompts: List[str]) -> List[str]:
+        """Answer several independent prompts with one structured request.
+        
+        Falls back to one request per prompt if the model's answer can't be
+        matched up with the prompts. generate_text only batches while no
+        tools are registered, so the plain model here matches self.model.
+        """
+        if len(prompts) == 1:
+            return [await self.generate_text(prompts[0])]
+        
+        tasks = "\n\n".join(
+            f"TASK {i}:\n{prompt}" for i, prompt in enumerate(prompts, 1)
+        )
+        combined = (
+            f"Perform these {len(prompts)} independent tasks. Return a JSON array "
+            f"of {len(prompts)} strings where element i is the complete answer "
+            f"to TASK i.\n\n{tasks}"
+        )
+        try:
+            async with self._sem:
+                response = await self._generate(
+                    self._get_plain_model(self.settings.gemini_model),
+                    combined,
+                    generation_config=_batch_generation_config(),
+                )
+            answers = _json_loads(response.text)
+        except ValueError:
+            answers = None
+        
+        if (
+            isinstance(answers, list)
+            and len(answers) == len(prompts)
+            and all(isinstance(answer, str) for answer in answers)
+        ):
+            return answers
+        
+        logger.warning("Batched request of %d prompts unusable; sending individually", len(prompts))
+        return list(await asyncio.gather(*(self.generate_text(prompt) for prompt in prompts)))
+    
+    async def generate_text_batch(
+        self,
+        prompts: List[str],
+        temperature: Optional[float] = None,
+    ) -> List[Any]:
+        """Generate text for several independent prompts concurrently.
+        
+        Requests share one model and its channel and are collected with
+        asyncio.gather, with at most gemini_max_concurrency in flight.
+        
+        Args:
+            prompts: Input prompts
+            temperature: Optional temperature override (0.0-1.0)
+            
+        Returns:
+            One result per prompt, in order (exceptions are returned in place)
+        """
+        async def _one(prompt: str) -> str:
+            async with self._sem:
+                return await self.generate_text(prompt, temperature=temperature)
+        
+        return await asyncio.gather(
+            *(_one(prompt) for prompt in prompts),
+            return_exceptions=True,
+        )
+    
     async def generate_with_tools(
         self,
         prompt: str,
         tools: Optional[List[Dict[str, Any]]] = None,
         use_search_grounding: bool = False,
         system_instruction: Optional[str] = None,
-        temperature: float = 0.7,
+        temperature: float = DEFAULT_TEMPERATURE,
     ) -> Dict[str, Any]:
         """Generate response with tool use from Vertex AI.
         
@@ -310,50 +802,18 @@ class GeminiService:
             Dictionary with response data and tool calls
         """
         try:
-            # Build model kwargs
-            generation_config = GenerationConfig(
-                temperature=temperature,
-                top_p=0.95,
-                top_k=40,
-                max_output_tokens=8192,
-            )
-            
-            model_kwargs = {
-                "model_name": self.settings.gemini_model,
-                "generation_config": generation_config,
-            }
-            
-            # Add system instruction if provided
-            if system_instruction:
-                model_kwargs["system_instruction"] = system_instruction
-            
-            # Add tools
-            model_tools = []
-            if tools:
-                model_tools = _build_vertex_tools(tools)
-            
-            # Add registered tools
-            if self._tool_declarations:
-                registered_tools = _build_vertex_tools(self._tool_declarations)
-                model_tools.extend(registered_tools)
-            
-            # Add Google Search grounding if enabled
-            if use_search_grounding and GoogleSearchRetrieval is not None:
-                try:
-                    model_tools.append(Tool(google_search_retrieval=GoogleSearchRetrieval()))
-                except Exception as e:
-                    print(f"Warning: GoogleSearchRetrieval not available: {e}")
+            # Generation settings travel with the request, not the model
+            generation_config = _generation_config(temperature)
             
-            if model_tools:
-                model_kwargs["tools"] = model_tools
-            
-            # Create model
-            model = GenerativeModel(**model_kwargs)
+            model = self._get_tools_model(
+                system_instruction=system_instruction,
+                tools=tools,
+                use_search_grounding=use_search_grounding,
+            )
             
             # Generate content
-            response = await asyncio.to_thread(
-                model.generate_content,
-                prompt
+            response = await self._generate(
+                model, prompt, generation_config=generation_config
             )
             
             # Process response - safely extract text (response.text raises ValueError
@@ -373,22 +833,23 @@ class GeminiService:
             
             # Extract tool calls and function_calls if any
             function_calls = []
-            if hasattr(response, 'candidates') and response.candidates:
-                for candidate in response.candidates:
-                    if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call is not None:
-                                fc_name = getattr(part.function_call, 'name', None)
-                                fc_args = getattr(part.function_call, 'args', {})
-                                if fc_name:
-                                    result["tools_used"].append({
-                                        "name": fc_name,
-                                        "args": dict(fc_args) if fc_args else {},
-                                    })
-                                    function_calls.append({
-                                        "name": fc_name,
-                                        "arguments": dict(fc_args) if fc_args else {},
-                                    })
+            for part in _parts(response):
+                fc = getattr(part, 'function_call', None)
+                if fc is not None:
+                    fc_name = getattr(fc, 'name', None)
+                    fc_args = getattr(fc, 'args', {})
+                    if fc_name:
+                        # Callers json.dumps these, so copy the proto map
+                        # once here and share it between both views.
+                        args = dict(fc_args) if fc_args else {}
+                        result["tools_used"].append({
+                            "name": fc_name,
+                            "args": args,
+                        })
+                        function_calls.append({
+                            "name": fc_name,
+                            "arguments": args,
+                        })
             
             # Add function_calls for chatbot_manager compatibility
             if function_calls:
@@ -400,9 +861,7 @@ class GeminiService:
             return result
             
         except Exception as e:
-            print(f"❌ Error in generate_with_tools: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Error in generate_with_tools: %s", e, exc_info=True)
             error_msg = f"Error: {str(e)}"
             return {
                 "success": False,
@@ -412,6 +871,20 @@ class GeminiService:
                 "tools_used": [],
             }
     
+    def _fit_input(self, template: str, text: str) -> str:
+        """Fill the ``{text}`` slot of a prompt template with a document.
+        
+        The document is trimmed so the whole prompt, plus room for
+        _MAX_OUTPUT_TOKENS of output, stays within gemini_max_input_tokens.
+        Uses the same ~4 characters per token estimate as the rest of the
+        backend; a document that fits is inserted unchanged.
+        """
+        budget = (
+            (self.settings.gemini_max_input_tokens - _MAX_OUTPUT_TOKENS) * 4
+            - (len(template) - len("{text}"))
+        )
+        return template.replace("{text}", _truncate_middle(text, budget), 1)
+    
     async def analyze_contract(self, contract_text: str) -> Dict[str, Any]:
         """Analyze a legal contract using Vertex AI.
         
@@ -421,65 +894,91 @@ class GeminiService:
         Returns:
             Analysis results
         """
-        prompt = f"""Analyze the following legal contract and provide:
+        prompt = self._fit_input("""Analyze the following legal contract and provide:
 1. Summary of key terms
 2. Identified risks or concerns
 3. Notable provisions and obligations
 4. Recommendations
 
 CONTRACT TEXT:
-{contract_text}
+{text}
 
-Please provide a detailed analysis."""
+Please provide a detailed analysis.""", contract_text)
         
         return await self.generate_with_tools(prompt)
     
-    async def extract_entities(self, text: str, entity_types: Optional[List[str]] = None) -> Dict[str, Any]:
+    async def extract_entities(
+        self,
+        text: str,
+        entity_types: Optional[List[str]] = None,
+        batch: bool = False,
+    ) -> Dict[str, Any]:
         """Extract entities from text using Vertex AI.
         
         Args:
             text: Text to analyze
             entity_types: Optional list of entity types to extract
+            batch: Coalesce with concurrent calls (see generate_text)
             
         Returns:
             Extracted entities
         """
         types_str = ", ".join(entity_types) if entity_types else "named entities"
-        prompt = f"""Extract {types_str} from the following text:
+        prompt = self._fit_input(f"""Extract {types_str} from the following text:
 
 TEXT:
-{text}
+{{text}}
 
-Return the results as a JSON object with entity types as keys and lists of entities as values."""
+Return the results as a JSON object with entity types as keys and lists of entities as values.""", text)
         
-        result = await self.generate_text(prompt)
+        result = await self.generate_text(prompt, batch=batch)
         
         try:
-            entities = json.loads(result)
-        except json.JSONDecodeError:
+            entities = _json_loads(result)
+        except ValueError:
             entities = {"raw_text": result}
         
         return {"success": True, "entities": entities}
     
-    async def summarize(self, text: str, max_length: Optional[int] = None) -> str:
+    async def summarize(
+        self,
+        text: str,
+        max_length: Optional[int] = None,
+        batch: bool = False,
+    ) -> str:
         """Summarize text using Vertex AI.
         
         Args:
             text: Text to summarize
             max_length: Optional maximum length for summary
+            batch: Coalesce with concurrent calls (see generate_text)
             
         Returns:
             Summary text
         """
+        return await self.generate_text(self._summary_prompt(text, max_length), batch=batch)
+    
+    def summarize_stream(self, text: str, max_length: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream a summary of text as it is generated.
+        
+        Args:
+            text: Text to summarize
+            max_length: Optional maximum length for summary
+            
+        Returns:
+            Async iterator of summary text deltas
+        """
+        return self.generate_text_stream(self._summary_prompt(text, max_length))
+    
+    def _summary_prompt(self, text: str, max_length: Optional[int]) -> str:
+        """Build the summarization prompt shared by summarize and summarize_stream."""
         length_constraint = f" in approximately {max_length} words" if max_length else ""
-        prompt = f"""Summarize the following text{length_constraint}:
+        return self._fit_input(f"""Summarize the following text{length_constraint}:
 
 TEXT:
-{text}
+{{text}}
 
-SUMMARY:"""
-        
-        return await self.generate_text(prompt)
+SUMMARY:""", text)
 
 
 # Singleton instance
@@ -3,26 +3,473 @@ Gemini Service
 Handles all interactions with the Google Gemini API.
 """
 
-import google.generativeai as genai
-from google.generativeai.types import GenerateContentResponse
-from typing import Dict, List, Any, Optional, Callable
+import warnings
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Callable, Tuple, Union, AsyncIterator, Iterator, Mapping
+from datetime import timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import contextvars
+import copy
+import functools
 import json
+import operator
 import asyncio
+import hashlib
+import logging
 import os
-from functools import lru_cache
-import warnings
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+from google.api_core import exceptions as google_exceptions
+from google.api_core.retry import if_exception_type
+from google.api_core.retry_async import AsyncRetry
 
 from config.settings import get_settings, get_gemini_api_key
 
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from google.generativeai.types import GenerateContentResponse
+
+
+class _LazyGenAI:
+    """Stand-in for google.generativeai that imports it on first use.
+    
+    Vertex AI deployments never touch the AI Studio SDK, so they skip its
+    import cost entirely.
+    """
+    
+    __slots__ = ("_module",)
+    
+    def __init__(self):
+        self._module = None
+    
+    def __getattr__(self, name: str):
+        module = self._module
+        if module is None:
+            # google.generativeai emits a deprecation FutureWarning on import
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', FutureWarning)
+                import google.generativeai as module
+            self._module = module
+        return getattr(module, name)
+
+
+genai = _LazyGenAI()
+
+
+# Explicit context caching: the API rejects caches below 32,768 tokens on
+# Gemini 1.5/2.0, so smaller documents are sent inline
+_CONTEXT_CACHE_MIN_TOKENS = 32_768
+_CONTEXT_CACHE_TTL = timedelta(minutes=10)
+# Cached document handles kept per service, in LRU order
+_CONTEXT_CACHE_SIZE = 64
+# Seconds before retrying a document whose cache creation failed
+_CONTEXT_CACHE_RETRY_AFTER = 300.0
+# Errors meaning caching can't work for this project/model at all
+_CONTEXT_CACHE_FATAL_ERRORS = (
+    ImportError,
+    AttributeError,
+    google_exceptions.PermissionDenied,
+    google_exceptions.NotFound,
+    google_exceptions.MethodNotImplemented,
+)
+
+# Response cache sizing and the embedding model used for semantic lookups
+_RESPONSE_CACHE_SIZE = 1024
+_EMBEDDING_MODEL = "text-embedding-004"
+
+# Only the most recent messages are sent as chat history
+_MAX_HISTORY_MESSAGES = 200
+
+# Precomputed accessors for the per-response function call walk
+_CANDIDATES = operator.attrgetter("candidates")
+_PARTS = operator.attrgetter("content.parts")
+
+
+def _parts(response) -> Any:
+    """Get the parts of a response's first candidate, or () if it has none."""
+    candidates = _CANDIDATES(response)
+    return (_PARTS(candidates[0]) or ()) if candidates else ()
+
+
+def _iter_function_calls(response) -> Iterator[Tuple[str, Any]]:
+    """Yield (name, args) for each function call in the first candidate."""
+    for part in _parts(response):
+        fc = getattr(part, "function_call", None)
+        if fc:
+            yield fc.name, fc.args
+
+
+# Stored message roles mapped to Gemini roles; anything else is "model"
+_ROLE_MAP = {"user": "user"}
+
+# Upper bound on GenerativeModel instances kept per service (LRU)
+_MODEL_CACHE_SIZE = 32
+
+def _json_dumps(value: Any) -> str:
+    """Serialize to a JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, default=str)
+
+
+def _json_loads(text: str) -> Any:
+    """Parse a JSON string, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+# Retry 503/429 responses with exponential backoff (0.5s, 1s, 2s, capped at 4s)
+_retry_transient = AsyncRetry(
+    predicate=if_exception_type(
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.ResourceExhausted,
+    ),
+    initial=0.5,
+    multiplier=2.0,
+    maximum=4.0,
+    timeout=30.0,
+)
+
+
+
+class _TokenBucket:
+    """Async token bucket allowing `rate` acquisitions per `period` seconds."""
+    
+    def __init__(self, rate: int, period: float = 60.0):
+        self._capacity = float(rate)
+        self._tokens = float(rate)
+        self._fill_rate = rate / period
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        while True:
+            # Refill and take under the lock, but sleep outside it so other
+            # waiters can re-check instead of queueing behind one sleeper
+            async with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity,
+                    self._tokens + (now - self._updated) * self._fill_rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._fill_rate
+            await asyncio.sleep(wait)
+
+
+# Process-wide request pacing, created on first use (False when disabled)
+_RATE_LIMITER: Union[_TokenBucket, bool, None] = None
+
+
+async def _paced(func: Callable, *args, **kwargs):
+    """Take a rate limiter token, then await func(*args, **kwargs)."""
+    global _RATE_LIMITER
+    if _RATE_LIMITER is None:
+        rpm = get_settings().gemini_requests_per_minute
+        _RATE_LIMITER = _TokenBucket(rpm) if rpm > 0 else False
+    if _RATE_LIMITER:
+        await _RATE_LIMITER.acquire()
+    return await func(*args, **kwargs)
+
+
+# The retry wrapper is built once; _api_call only binds the target
+_paced_with_retry = _retry_transient(_paced)
+
+
+def _api_call(func: Callable) -> Callable:
+    """Wrap an SDK coroutine method with client-side pacing and retries.
+    
+    Each attempt, including retries, takes a token from the
+    gemini_requests_per_minute bucket, which keeps bursts under the quota
+    instead of running into 429 backoff.
+    """
+    return functools.partial(_paced_with_retry, func)
+
+
+# Google Search grounding tool for AI Studio, built on first use
+_GOOGLE_SEARCH_TOOL = None
+
+
+def _google_search_tool():
+    """Get the shared Google Search retrieval tool for AI Studio models."""
+    global _GOOGLE_SEARCH_TOOL
+    if _GOOGLE_SEARCH_TOOL is None:
+        from google.generativeai.types import Tool
+        _GOOGLE_SEARCH_TOOL = Tool.from_google_search_retrieval()
+    return _GOOGLE_SEARCH_TOOL
+
+
+# Set once the SDK has been configured for this process
+_API_CONFIGURED = False
+
+# Shared, bounded pool for sync tool handlers (created on first use)
+_TOOL_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    """Get the process-wide executor used for sync tool handlers."""
+    global _TOOL_EXECUTOR
+    if _TOOL_EXECUTOR is None:
+        _TOOL_EXECUTOR = ThreadPoolExecutor(
+            max_workers=get_settings().tool_max_workers or 16,
+            thread_name_prefix="gemini-tool",
+        )
+        atexit.register(_TOOL_EXECUTOR.shutdown)
+    return _TOOL_EXECUTOR
+
+
+# Pool for blocking SDK calls; HTTP-bound, so sized for I/O rather than CPU
+_IO_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+async def _run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking SDK call on the shared I/O thread pool.
+    
+    The caller's contextvars are carried into the worker, as with
+    asyncio.to_thread.
+    """
+    global _IO_EXECUTOR
+    if _IO_EXECUTOR is None:
+        _IO_EXECUTOR = ThreadPoolExecutor(
+            max_workers=get_settings().gemini_io_max_workers or 64,
+            thread_name_prefix="gemini",
+        )
+        atexit.register(_IO_EXECUTOR.shutdown)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _IO_EXECUTOR,
+        functools.partial(contextvars.copy_context().run, func, *args, **kwargs),
+    )
+
+
+def _split_template(text: str) -> Tuple[str, str, str]:
+    """Split a prompt template into the literals around its placeholders."""
+    head, rest = text.split("$content", 1)
+    middle, tail = rest.split("$additional_context", 1)
+    return head, middle, tail
+
+
+# Prompt templates for analyze_document, pre-split into literal fragments
+# at import so rendering is a single str.join
+_ANALYSIS_TEMPLATES: Dict[str, Tuple[str, str, str]] = {
+    k: _split_template(v) for k, v in {
+        "contract": """Analyze this contract and extract:
+                1. Contract type
+                2. Parties involved
+                3. Key terms and dates
+                4. Obligations for each party
+                5. Termination conditions
+                
+                Contract content:
+                $content
+                
+                $additional_context
+                
+                Provide a structured analysis.""",
+        
+        "risk": """Analyze this document for legal risks:
+                1. Identify potentially problematic clauses
+                2. Flag ambiguous language
+                3. Note missing standard protections
+                4. Assess liability exposure
+                5. Rate each risk (low/medium/high/critical)
+                
+                Document content:
+                $content
+                
+                $additional_context
+                
+                Provide detailed risk assessment.""",
+        
+        "compliance": """Analyze this document for regulatory compliance:
+                1. Check GDPR compliance (if applicable)
+                2. Check industry-specific regulations
+                3. Identify non-compliant sections
+                4. Recommend changes for compliance
+                
+                Document content:
+                $content
+                
+                $additional_context
+                
+                Provide compliance assessment.""",
+    }.items()
+}
+
+
+# Appended to analysis prompts that carry several documents at once
+_MARSHALED_INSTRUCTIONS = """
+                
+                The content above contains several documents, each introduced by
+                a "=== DOCUMENT n ===" line. Analyze each document independently and
+                return a JSON array with exactly one object per document, in order."""
+
+# Response schema for marshaled multi-document analysis
+_MARSHALED_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "document": {"type": "integer"},
+            "analysis": {"type": "string"},
+        },
+        "required": ["document", "analysis"],
+    },
+}
+
+
+def _marshaled_analyses(rows: Any, count: int) -> Optional[List[str]]:
+    """Order a marshaled response's analyses by their 1-based document index.
+    
+    Returns None unless every document 1..count appears exactly once, so a
+    reordered response can't attach an analysis to the wrong document.
+    """
+    if not isinstance(rows, list) or len(rows) != count:
+        return None
+    analyses: List[Optional[str]] = [None] * count
+    for row in rows:
+        if not isinstance(row, dict):
+            return None
+        index = row.get("document")
+        if (
+            not isinstance(index, int)
+            or isinstance(index, bool)
+            or not 1 <= index <= count
+            or analyses[index - 1] is not None
+        ):
+            return None
+        analyses[index - 1] = str(row.get("analysis", ""))
+    return analyses
+
+
+def _estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token)."""
+    return len(text) // 4
+
+
+# Tokens each analysis template adds on top of the document itself
+_TEMPLATE_TOKENS: Dict[str, int] = {
+    k: _estimate_tokens("".join(t)) for k, t in _ANALYSIS_TEMPLATES.items()
+}
 
-# Suppress the deprecation warning for google.generativeai
-warnings.filterwarnings('ignore', category=FutureWarning, module='google.generativeai')
+# Smallest per-request document share worth splitting into; below this the
+# split would fan out into an unreasonable number of requests
+_MIN_SPLIT_TOKENS = 4096
+
+
+# Documents above this size are substituted into templates off the event loop
+_OFFLOOP_RENDER_CHARS = 256 * 1024
+
+
+def _fill_template(template: Tuple[str, str, str], content: str, context: str) -> str:
+    """Substitute content and context into a pre-split analysis template."""
+    head, middle, tail = template
+    return "".join((head, content, middle, context, tail))
+
+
+async def _render_prompt(template: Tuple[str, str, str], content: str, context: str) -> str:
+    """Substitute a document into an analysis template.
+    
+    Large documents are rendered in a worker thread so building the prompt
+    doesn't stall other requests on the event loop.
+    """
+    if len(content) > _OFFLOOP_RENDER_CHARS:
+        return await _run_blocking(_fill_template, template, content, context)
+    return _fill_template(template, content, context)
+
+
+_VERTEX_EMBEDDING_MODEL = None
+
+
+def _vertex_embedding_model():
+    """Get the shared Vertex AI embedding model, loading it on first use."""
+    global _VERTEX_EMBEDDING_MODEL
+    if _VERTEX_EMBEDDING_MODEL is None:
+        from vertexai.language_models import TextEmbeddingModel
+        _VERTEX_EMBEDDING_MODEL = TextEmbeddingModel.from_pretrained(_EMBEDDING_MODEL)
+    return _VERTEX_EMBEDDING_MODEL
+
+
+def _split_content(content: str, max_chars: int) -> List[str]:
+    """Split content on paragraph boundaries into chunks of at most max_chars.
+    
+    Paragraphs longer than max_chars are hard-split.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in content.split("\n\n"):
+        if current and size + len(paragraph) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        while len(paragraph) > max_chars:
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        current.append(paragraph)
+        size += len(paragraph) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
 
 
 # ============================================================================
 # SDK Version Detection & Compatibility Helpers
 # ============================================================================
 
+_vertex_mod = None
+
+
+def _get_vertex():
+    """Import vertexai.generative_models once and return the module."""
+    global _vertex_mod
+    if _vertex_mod is None:
+        import vertexai.generative_models as _vertex_mod
+    return _vertex_mod
+
+
+# Temperature-only generation configs, shared across requests. Bounded
+# because temperature comes from callers.
+_GEN_CONFIG_CACHE: Dict[Tuple[bool, float], Any] = {}
+_GEN_CONFIG_CACHE_SIZE = 64
+
+
+def _generation_config(use_vertex: bool, temperature: float):
+    """Get a shared GenerationConfig that only sets temperature."""
+    key = (use_vertex, temperature)
+    config = _GEN_CONFIG_CACHE.get(key)
+    if config is None:
+        if use_vertex:
+            config = _get_vertex().GenerationConfig(temperature=temperature)
+        else:
+            config = genai.GenerationConfig(temperature=temperature)
+        if len(_GEN_CONFIG_CACHE) >= _GEN_CONFIG_CACHE_SIZE:
+            _GEN_CONFIG_CACHE.clear()
+        _GEN_CONFIG_CACHE[key] = config
+    return config
+
+
 def _get_vertex_sdk_version():
     """Detect if required Vertex AI classes are available."""
     try:
@@ -36,38 +483,59 @@ def _get_vertex_sdk_version():
             return "unavailable"
 
 
+# Vertex AI classes by name; None marks one the installed SDK doesn't provide
+_VERTEX_CLASS_CACHE: Dict[str, Any] = {}
+
+
 def _safely_import_vertex_class(class_name: str):
-    """Safely import a Vertex AI class with fallback."""
+    """Safely import a Vertex AI class with fallback.
+    
+    Lookups (including misses) are cached, so each name touches the import
+    machinery at most once per process.
+    """
     try:
-        if class_name == "Schema":
-            from vertexai.generative_models import Schema
-            return Schema
-        elif class_name == "Type":
-            from vertexai.generative_models import Type
-            return Type
-        elif class_name == "Tool":
-            from vertexai.generative_models import Tool
-            return Tool
-        elif class_name == "FunctionDeclaration":
-            from vertexai.generative_models import FunctionDeclaration
-            return FunctionDeclaration
-        elif class_name == "GenerativeModel":
-            from vertexai.generative_models import GenerativeModel
-            return GenerativeModel
-        elif class_name == "GenerationConfig":
-            from vertexai.generative_models import GenerationConfig
-            return GenerationConfig
-        elif class_name == "GoogleSearchRetrieval":
-            from vertexai.generative_models import GoogleSearchRetrieval
-            return GoogleSearchRetrieval
-        elif class_name == "Part":
-            from vertexai.generative_models import Part
-            return Part
+        return _VERTEX_CLASS_CACHE[class_name]
+    except KeyError:
+        pass
+    try:
+        cls = getattr(_get_vertex(), class_name, None)
     except ImportError:
-        return None
+        cls = None
+    _VERTEX_CLASS_CACHE[class_name] = cls
+    return cls
 
 
-def _convert_json_schema_to_gemini(schema: Dict[str, Any]) -> Dict[str, Any]:
+# JSON Schema types mapped to Gemini Type enum names
+_GEMINI_TYPE_MAP = {
+    "object": "OBJECT",
+    "string": "STRING",
+    "number": "NUMBER",
+    "integer": "INTEGER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+}
+
+# Schema keywords copied through to Gemini unchanged
+_PASSTHROUGH_KEYS = frozenset({"description", "enum", "required", "format"})
+
+# JSON Schema types mapped to Vertex AI Type members, built once the SDK loads
+_VERTEX_TYPE_MAP: Optional[Dict[str, Any]] = None
+
+
+def _vertex_type_map() -> Optional[Dict[str, Any]]:
+    """Get the JSON Schema -> Vertex AI Type map; None if Type is unavailable."""
+    global _VERTEX_TYPE_MAP
+    if _VERTEX_TYPE_MAP is None:
+        Type = _safely_import_vertex_class("Type")
+        if Type is None:
+            return None
+        _VERTEX_TYPE_MAP = {
+            json_type: getattr(Type, name) for json_type, name in _GEMINI_TYPE_MAP.items()
+        }
+    return _VERTEX_TYPE_MAP
+
+
+def _convert_json_schema_to_gemini_uncached(schema: Dict[str, Any]) -> Dict[str, Any]:
     """Convert JSON Schema format to Gemini's expected schema format.
     
     Args:
@@ -84,16 +552,7 @@ def _convert_json_schema_to_gemini(schema: Dict[str, Any]) -> Dict[str, Any]:
     # Convert type field from string to Type enum
     if "type" in schema:
         type_str = schema["type"]
-        # Map JSON Schema types to Gemini Type enum values
-        type_mapping = {
-            "object": "OBJECT",
-            "string": "STRING",
-            "number": "NUMBER",
-            "integer": "INTEGER",
-            "boolean": "BOOLEAN",
-            "array": "ARRAY",
-        }
-        result["type_"] = type_mapping.get(type_str, "STRING")
+        result["type_"] = _GEMINI_TYPE_MAP.get(type_str, "STRING")
     
     # Copy other fields, converting recursively
     for key, value in schema.items():
@@ -101,50 +560,41 @@ def _convert_json_schema_to_gemini(schema: Dict[str, Any]) -> Dict[str, Any]:
             continue  # Already handled
         elif key == "properties" and isinstance(value, dict):
             result["properties"] = {
-                k: _convert_json_schema_to_gemini(v)
+                k: _convert_json_schema_to_gemini_uncached(v)
                 for k, v in value.items()
             }
         elif key == "items" and isinstance(value, dict):
-            result["items"] = _convert_json_schema_to_gemini(value)
-        elif key in ["description", "enum", "required", "format"]:
+            result["items"] = _convert_json_schema_to_gemini_uncached(value)
+        elif key in _PASSTHROUGH_KEYS:
             result[key] = value
     
     return result
 
 
-def _convert_json_schema_to_vertex(schema: Dict[str, Any]):
+def _convert_json_schema_to_vertex_uncached(schema: Dict[str, Any]):
     """Convert JSON Schema format to Vertex AI Schema objects."""
     if not isinstance(schema, dict):
         return schema
 
     Schema = _safely_import_vertex_class("Schema")
-    Type = _safely_import_vertex_class("Type")
+    type_mapping = _vertex_type_map()
     
-    if Schema is None or Type is None:
+    if Schema is None or type_mapping is None:
         return None
 
-    type_mapping = {
-        "object": Type.OBJECT,
-        "string": Type.STRING,
-        "number": Type.NUMBER,
-        "integer": Type.INTEGER,
-        "boolean": Type.BOOLEAN,
-        "array": Type.ARRAY,
-    }
-
     try:
-        schema_type = type_mapping.get(schema.get("type", "string"), Type.STRING)
+        schema_type = type_mapping.get(schema.get("type", "string"), type_mapping["string"])
         properties = None
         items = None
 
         if schema.get("properties") and isinstance(schema["properties"], dict):
             properties = {
-                k: _convert_json_schema_to_vertex(v)
+                k: _convert_json_schema_to_vertex_uncached(v)
                 for k, v in schema["properties"].items()
             }
 
         if schema.get("items") and isinstance(schema["items"], dict):
-            items = _convert_json_schema_to_vertex(schema["items"])
+            items = _convert_json_schema_to_vertex_uncached(schema["items"])
 
         return Schema(
             type_=schema_type,
@@ -155,8 +605,92 @@ def _convert_json_schema_to_vertex(schema: Dict[str, Any]):
             enum=schema.get("enum"),
         )
     except Exception as e:
-        print(f"⚠️ Error converting schema for Vertex AI: {e}")
+        logger.warning("Error converting schema for Vertex AI: %s", e)
+        return None
+
+
+# Converted schemas keyed by a hash of the canonical JSON schema. Results are
+# shared between callers and must not be mutated.
+_GEMINI_SCHEMA_CACHE: Dict[bytes, Dict[str, Any]] = {}
+# ids of dicts held in _GEMINI_SCHEMA_CACHE; the cache keeps them alive, so
+# an id here always refers to an already-converted schema
+_GEMINI_CONVERTED_IDS: set = set()
+_VERTEX_SCHEMA_CACHE: Dict[bytes, Any] = {}
+
+
+def _schema_key(schema: Dict[str, Any]) -> Optional[bytes]:
+    """Hash a JSON schema's content; None if it isn't JSON-serializable."""
+    try:
+        if orjson is not None:
+            canonical = orjson.dumps(schema, option=orjson.OPT_SORT_KEYS)
+        else:
+            canonical = json.dumps(schema, sort_keys=True).encode()
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(canonical, digest_size=16).digest()
+
+
+# Tool-definition fields sent to the model; anything else (e.g. handler) is local
+_DECLARATION_KEYS = ("name", "description", "parameters")
+
+
+def _declaration_key(tools: List[Dict[str, Any]]) -> Optional[bytes]:
+    """Hash the declaration fields of tool definitions, ignoring handlers."""
+    return _schema_key([
+        {field: tool[field] for field in _DECLARATION_KEYS if field in tool}
+        for tool in tools
+    ])
+
+
+# Compiled fastjsonschema validators keyed by schema hash; None marks a schema
+# fastjsonschema can't compile (e.g. Gemini-style upper-case types)
+_VALIDATOR_CACHE: Dict[bytes, Optional[Callable]] = {}
+
+
+def _schema_validator(schema: Dict[str, Any]) -> Optional[Callable]:
+    """Get a compiled validator for a JSON schema; None if unavailable."""
+    if fastjsonschema is None:
         return None
+    key = _schema_key(schema)
+    if key is None:
+        return None
+    if key not in _VALIDATOR_CACHE:
+        try:
+            _VALIDATOR_CACHE[key] = fastjsonschema.compile(schema)
+        except fastjsonschema.JsonSchemaDefinitionException as e:
+            logger.warning("Response schema can't be compiled for validation: %s", e)
+            _VALIDATOR_CACHE[key] = None
+    return _VALIDATOR_CACHE[key]
+
+
+def _convert_json_schema_to_gemini(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert JSON Schema to Gemini's format, memoized on schema content."""
+    if not isinstance(schema, dict) or id(schema) in _GEMINI_CONVERTED_IDS:
+        return schema
+    key = _schema_key(schema)
+    if key is None:
+        return _convert_json_schema_to_gemini_uncached(schema)
+    result = _GEMINI_SCHEMA_CACHE.get(key)
+    if result is None:
+        result = _GEMINI_SCHEMA_CACHE[key] = _convert_json_schema_to_gemini_uncached(schema)
+        _GEMINI_CONVERTED_IDS.add(id(result))
+    return result
+
+
+def _convert_json_schema_to_vertex(schema: Dict[str, Any]):
+    """Convert JSON Schema to a Vertex AI Schema, memoized on schema content."""
+    if not isinstance(schema, dict):
+        return schema
+    key = _schema_key(schema)
+    if key is None:
+        return _convert_json_schema_to_vertex_uncached(schema)
+    result = _VERTEX_SCHEMA_CACHE.get(key)
+    if result is None:
+        result = _convert_json_schema_to_vertex_uncached(schema)
+        # Failed conversions return None and are retried next time
+        if result is not None:
+            _VERTEX_SCHEMA_CACHE[key] = result
+    return result
 
 
 def _build_vertex_tools(tools: List[Dict[str, Any]]):
@@ -185,28 +719,108 @@ def _build_vertex_tools(tools: List[Dict[str, Any]]):
 
         return vertex_tools
     except Exception as e:
-        print(f"⚠️ Error building Vertex AI tools: {e}")
+        logger.warning("Error building Vertex AI tools: %s", e)
         return []
 
 
 class GeminiService:
     """Service for interacting with the Gemini API."""
     
+    __slots__ = (
+        "settings",
+        "_use_vertex",
+        "_model",
+        "_model_cache",
+        "_content_cache",
+        "_content_cache_disabled",
+        "_exact_cache",
+        "_inflight",
+        "_semantic_keys",
+        "_semantic_matrix",
+        "_semantic_size",
+        "_semantic_next",
+        "_sem",
+        "_tools",
+        "_tool_declarations",
+        "_tool_declarations_frozen",
+        "_tools_version",
+        "_vertex_tools_cache",
+        "_gemini_tools_cache",
+        "_warmup_task",
+    )
+    
     def __init__(self):
         """Initialize the Gemini service."""
         self.settings = get_settings()
-        # Check environment variable for USE_VERTEX_AI before configuring
-        env_val = os.getenv("USE_VERTEX_AI", "true").lower()
-        print(f"🔍 GeminiService init: USE_VERTEX_AI env = '{env_val}' -> {env_val in ('true', '1', 'yes')}")
+        # Resolve the backend once; _configure_api only sets up this one, so
+        # it can't change for the lifetime of the service
+        self._use_vertex = self._resolve_use_vertex()
+        logger.debug("GeminiService init: use_vertex = %s", self._use_vertex)
         self._configure_api()
         self._model = None
-        self._tools: Dict[str, Callable] = {}
-        self._tool_declarations: List[Dict] = []
-        # use_vertex is now a property - don't cache it
+        # (backend, model, system instruction, ...) -> model, in LRU order
+        self._model_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        # sha256(content) -> (cached content handle, monotonic expiry), in LRU
+        # order; a None handle marks a failed creation not to retry until expiry
+        self._content_cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # Set after a permanent caching error; inline content from then on
+        self._content_cache_disabled = False
+        # Prompt hash -> (response, monotonic expiry), in LRU order
+        self._exact_cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # Prompt hash -> future for a cacheable request currently in flight
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Ring buffer of normalized prompt embeddings, one row per slot of
+        # _semantic_keys; allocated on first use once the dimension is known
+        self._semantic_keys: List[Optional[str]] = [None] * _RESPONSE_CACHE_SIZE
+        self._semantic_matrix: Optional[Any] = None
+        self._semantic_size = 0
+        self._semantic_next = 0
+        # Bounds in-flight requests issued by generate_content_batch
+        self._sem = asyncio.Semaphore(self.settings.gemini_max_concurrency or 50)
+        # Tool name -> (handler, whether the handler is a coroutine function)
+        self._tools: Dict[str, Tuple[Callable, bool]] = {}
+        # Tool name -> declaration, in registration order
+        self._tool_declarations: Dict[str, Dict] = {}
+        # Immutable snapshot of _tool_declarations handed to model builders
+        self._tool_declarations_frozen: Tuple[Dict, ...] = ()
+        # Built SDK tool lists, rebuilt only after register_tool
+        self._tools_version = 0
+        self._vertex_tools_cache: Optional[List[Any]] = None
+        self._gemini_tools_cache: Optional[List[Dict]] = None
+        
+        # Open the API channel in the background when constructed on a loop
+        self._warmup_task: Optional[asyncio.Task] = None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            self._warmup_task = loop.create_task(self.warm_up())
+    
+    async def warm_up(self) -> None:
+        """Establish the API connection ahead of the first real request.
+        
+        Issues a one-token count_tokens call so the channel (TLS and auth
+        handshake) is already open when user traffic arrives. Failures are
+        logged and otherwise ignored.
+        """
+        try:
+            if self.use_vertex:
+                model = _get_vertex().GenerativeModel(model_name=self.settings.gemini_model)
+            else:
+                model = genai.GenerativeModel(model_name=self.settings.gemini_model)
+            await model.count_tokens_async("x")
+            logger.info("Gemini API connection warmed up")
+        except Exception as e:
+            logger.warning("Gemini API warm-up failed: %s", e)
     
     @property
     def use_vertex(self) -> bool:
-        """Dynamically read use_vertex_ai from settings and environment variable."""
+        """Whether this service talks to Vertex AI rather than AI Studio."""
+        return self._use_vertex
+    
+    def _resolve_use_vertex(self) -> bool:
+        """Read use_vertex_ai from the environment variable and settings."""
         # Always check environment variable first to respect Cloud Run deployments
         env_val = os.getenv("USE_VERTEX_AI", "true").lower()
         if env_val in ("true", "1", "yes"):
@@ -217,21 +831,31 @@ class GeminiService:
         return self.settings.use_vertex_ai
     
     def _configure_api(self):
-        """Configure the Gemini API with credentials."""
+        """Configure the Gemini API with credentials.
+        
+        SDK configuration is process-global, so it runs once per process.
+        Every GeminiService instance shares the configured client state.
+        """
+        global _API_CONFIGURED
+        if _API_CONFIGURED:
+            return
+        
         if self.use_vertex:  # Use the property instead of self.settings.use_vertex_ai
             try:
                 import vertexai
-                print(f"Initializing Vertex AI (project: {self.settings.google_cloud_project})...")
                 vertexai.init(project=self.settings.google_cloud_project, location="us-central1")
-                print(f"✅ Using Vertex AI with Application Default Credentials")
-                print(f"   Project: {self.settings.google_cloud_project}")
-                print(f"   Region: us-central1")
+                logger.info(
+                    "Using Vertex AI with Application Default Credentials "
+                    "(project: %s, region: us-central1)",
+                    self.settings.google_cloud_project,
+                )
             except Exception as e:
-                print(f"❌ Vertex AI initialization failed: {e}")
-                print("This usually means:")
-                print("  1. Service account doesn't have 'Vertex AI User' role")
-                print("  2. Application Default Credentials not available")
-                print("  3. Network connectivity issue")
+                logger.error(
+                    "Vertex AI initialization failed: %s. This usually means the "
+                    "service account lacks the 'Vertex AI User' role, Application "
+                    "Default Credentials are unavailable, or the network is down.",
+                    e,
+                )
                 raise RuntimeError(
                     f"Failed to initialize Vertex AI: {e}. "
                     "Ensure the service account has 'roles/aiplatform.user' permission."
@@ -239,92 +863,284 @@ class GeminiService:
         else:
             api_key = get_gemini_api_key()
             if api_key:
-                genai.configure(api_key=api_key)
-                print("✅ Using AI Studio (Gemini API) with API key")
-                print(f"   Model: {self.settings.gemini_model}")
+                # Default gRPC transport: the *_async methods get a pooled
+                # grpc_asyncio channel, sync calls keep a regular channel
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', FutureWarning)
+                    genai.configure(
+                        api_key=api_key,
+                        client_options={"api_endpoint": "generativelanguage.googleapis.com"},
+                    )
+                logger.info(
+                    "Using AI Studio (Gemini API) with API key (model: %s)",
+                    self.settings.gemini_model,
+                )
             else:
                 raise RuntimeError(
                     "No credentials available. Please provide either:\n"
                     "  1. GEMINI_API_KEY for AI Studio API\n"
                     "  2. Set USE_VERTEX_AI=true with proper GCP credentials for Vertex AI"
                 )
+        
+        _API_CONFIGURED = True
     
     @property
     def model(self):
         """Get or create the Gemini model instance."""
-        if self._model is None:
-            if not self.use_vertex:
-                # Using non-Vertex AI mode
-                # Build generation config
-                generation_config = genai.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=8192,
+        model = self._model
+        if model is None:
+            model = self._model = self._build_default_model()
+        return model
+    
+    def _build_default_model(self):
+        """Build the default model with the registered tools attached."""
+        if not self.use_vertex:
+            # Using non-Vertex AI mode
+            # Build generation config
+            generation_config = genai.GenerationConfig(
+                temperature=0.7,
+                top_p=0.95,
+                top_k=40,
+                max_output_tokens=8192,
+            )
+            
+            # Create model with tools if registered
+            model_kwargs = {
+                "model_name": self.settings.gemini_model,
+                "generation_config": generation_config,
+            }
+            
+            # Add tools if any registered
+            if self._tool_declarations_frozen:
+                model_kwargs["tools"] = list(self._get_gemini_tools())
+            
+            # Add Google Search grounding if enabled
+            if self.settings.enable_search_grounding:
+                try:
+                    google_search = _google_search_tool()
+                    if google_search:
+                        if "tools" in model_kwargs:
+                            model_kwargs["tools"].append(google_search)
+                        else:
+                            model_kwargs["tools"] = [google_search]
+                except Exception as e:
+                    logger.warning("Google Search not available: %s", e)
+            
+            return genai.GenerativeModel(**model_kwargs)
+        else:
+            # Using Vertex AI mode - STRICT, no fallbacks
+            GenerativeModel = _safely_import_vertex_class("GenerativeModel")
+            if not GenerativeModel:
+                raise RuntimeError(
+                    "Vertex AI GenerativeModel class not available. "
+                    "This indicates the vertexai SDK is not properly installed. "
+                    "Install with: pip install google-cloud-aiplatform"
                 )
-                
-                # Create model with tools if registered
-                model_kwargs = {
-                    "model_name": self.settings.gemini_model,
-                    "generation_config": generation_config,
-                }
-                
-                # Add tools if any registered
-                if self._tool_declarations:
-                    model_kwargs["tools"] = self._tool_declarations
-                
-                # Add Google Search grounding if enabled
-                if self.settings.enable_search_grounding:
-                    try:
-                        from google.generativeai.types import Tool
-                        google_search = Tool.from_google_search_retrieval()
-                        if google_search:
-                            if "tools" in model_kwargs:
-                                model_kwargs["tools"].append(google_search)
-                            else:
-                                model_kwargs["tools"] = [google_search]
-                    except Exception as e:
-                        print(f"⚠️ Google Search not available: {e}")
-                
-                self._model = genai.GenerativeModel(**model_kwargs)
+            
+            # Build generation config for Vertex AI
+            generation_config = _get_vertex().GenerationConfig(
+                temperature=0.7,
+                top_p=0.95,
+                top_k=40,
+                max_output_tokens=8192,
+            )
+            
+            # Create model with tools if registered
+            model_kwargs = {
+                "model_name": self.settings.gemini_model,
+                "generation_config": generation_config,
+            }
+            
+            # Add tools if any registered
+            if self._tool_declarations_frozen:
+                vertex_tools = self._get_vertex_tools()
+                if vertex_tools:  # Only add if conversion successful
+                    model_kwargs["tools"] = vertex_tools
+            
+            # Note: Google Search grounding in Vertex AI requires additional setup
+            # Skipping for now to avoid compatibility issues
+            
+            return GenerativeModel(**model_kwargs)
+    
+    def _get_vertex_tools(self) -> List[Any]:
+        """Get Vertex AI Tool objects for the registered tools (cached)."""
+        if self._vertex_tools_cache is None:
+            self._vertex_tools_cache = _build_vertex_tools(self._tool_declarations_frozen)
+        return self._vertex_tools_cache
+    
+    def _get_gemini_tools(self) -> List[Dict]:
+        """Get AI Studio tool declarations for the registered tools (cached)."""
+        if self._gemini_tools_cache is None:
+            self._gemini_tools_cache = list(self._tool_declarations_frozen)
+        return self._gemini_tools_cache
+    
+    def _get_or_create_model(
+        self,
+        system_instruction: Optional[str] = None,
+        response_schema: Optional[Dict[str, Any]] = None,
+    ):
+        """Get a cached model for a system instruction / response schema.
+        
+        Models with a response schema are built for JSON output without
+        tools; all others carry the registered tools. The cache is cleared
+        whenever a tool is registered.
+        
+        Args:
+            system_instruction: Optional system instruction
+            response_schema: Optional JSON schema for structured output
+            
+        Returns:
+            Model instance for the active backend
+        """
+        key = (
+            self.use_vertex,
+            self.settings.gemini_model,
+            system_instruction,
+            repr(response_schema) if response_schema is not None else None,
+        )
+        model = self._cached_model(key)
+        if model is not None:
+            return model
+        
+        if self.use_vertex:
+            GenerativeModel = _safely_import_vertex_class("GenerativeModel")
+            if not GenerativeModel:
+                raise RuntimeError(
+                    "Vertex AI GenerativeModel class not available. "
+                    "Install with: pip install google-cloud-aiplatform"
+                )
+            GenerationConfig = _safely_import_vertex_class("GenerationConfig")
+        else:
+            GenerativeModel = genai.GenerativeModel
+            GenerationConfig = genai.GenerationConfig
+        
+        if response_schema is not None:
+            model = GenerativeModel(
+                model_name=self.settings.gemini_model,
+                system_instruction=system_instruction,
+                generation_config=GenerationConfig(
+                    candidate_count=1,
+                    response_mime_type="application/json",
+                    response_schema=response_schema,
+                ),
+            )
+        else:
+            if self.use_vertex:
+                tools = self._get_vertex_tools() or None
             else:
-                # Using Vertex AI mode - STRICT, no fallbacks
-                GenerativeModel = _safely_import_vertex_class("GenerativeModel")
-                if not GenerativeModel:
-                    raise RuntimeError(
-                        "Vertex AI GenerativeModel class not available. "
-                        "This indicates the vertexai SDK is not properly installed. "
-                        "Install with: pip install google-cloud-aiplatform"
-                    )
-                
-                from vertexai.generative_models import GenerationConfig
-                
-                # Build generation config for Vertex AI
-                generation_config = GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=8192,
+                tools = self._get_gemini_tools() or None
+            model = GenerativeModel(
+                model_name=self.settings.gemini_model,
+                system_instruction=system_instruction,
+                tools=tools,
+            )
+        
+        self._store_model(key, model)
+        return model
+    
+    def _cached_model(self, key: tuple):
+        """Look up a cached model and mark it most recently used."""
+        model = self._model_cache.get(key)
+        if model is not None:
+            self._model_cache.move_to_end(key)
+        return model
+    
+    def _store_model(self, key: tuple, model: Any) -> None:
+        """Cache a model, evicting the least recently used past the limit."""
+        self._model_cache[key] = model
+        if len(self._model_cache) > _MODEL_CACHE_SIZE:
+            self._model_cache.popitem(last=False)
+    
+    def _get_tools_model(
+        self,
+        system_instruction: Optional[str] = None,
+        tools: Optional[List[Dict]] = None,
+        use_search_grounding: bool = False,
+    ):
+        """Get a cached model for caller-supplied tool definitions.
+        
+        Generation settings such as temperature are passed per request, so
+        one model serves every call with the same instruction and tools.
+        
+        Args:
+            system_instruction: Optional system instruction
+            tools: Tool definitions (JSON Schema format)
+            use_search_grounding: Whether to add the search grounding tool
+            
+        Returns:
+            Model instance for the active backend
+        """
+        tools_key = _declaration_key(tools) if tools else b""
+        key = None
+        if tools_key is not None:
+            key = (
+                self.use_vertex,
+                self.settings.gemini_model,
+                system_instruction,
+                tools_key,
+                use_search_grounding,
+            )
+            model = self._cached_model(key)
+            if model is not None:
+                return model
+        
+        model_kwargs = {"model_name": self.settings.gemini_model}
+        if system_instruction:
+            model_kwargs["system_instruction"] = system_instruction
+        
+        # Convert tools to SDK-specific format
+        model_tools = []
+        if tools is self._tool_declarations_frozen:
+            # The registered set is already compiled by register_tool
+            model_tools = list(
+                self._get_vertex_tools() if self.use_vertex else self._get_gemini_tools()
+            )
+        elif tools:
+            if self.use_vertex:
+                model_tools = _build_vertex_tools(tools)
+            else:
+                for tool in tools:
+                    func_decl = {
+                        "name": tool["name"],
+                        "description": tool["description"],
+                    }
+                    if "parameters" in tool:
+                        func_decl["parameters"] = _convert_json_schema_to_gemini(tool["parameters"])
+                    model_tools.append(func_decl)
+        
+        if use_search_grounding:
+            if self.use_vertex:
+                try:
+                    Tool = _safely_import_vertex_class("Tool")
+                    GoogleSearchRetrieval = _safely_import_vertex_class("GoogleSearchRetrieval")
+                    if Tool and GoogleSearchRetrieval:
+                        model_tools.append(Tool(google_search_retrieval=GoogleSearchRetrieval()))
+                except Exception as e:
+                    logger.warning("GoogleSearchRetrieval not available: %s", e)
+            else:
+                try:
+                    model_tools.append(_google_search_tool())
+                except Exception as e:
+                    logger.warning("Google Search not available: %s", e)
+        
+        if model_tools:
+            model_kwargs["tools"] = model_tools
+        
+        # Use appropriate SDK based on configuration
+        if self.use_vertex:
+            GenerativeModel = _safely_import_vertex_class("GenerativeModel")
+            if not GenerativeModel:
+                raise RuntimeError(
+                    "Vertex AI GenerativeModel class not available. "
+                    "Install with: pip install google-cloud-aiplatform"
                 )
-                
-                # Create model with tools if registered
-                model_kwargs = {
-                    "model_name": self.settings.gemini_model,
-                    "generation_config": generation_config,
-                }
-                
-                # Add tools if any registered
-                if self._tool_declarations:
-                    vertex_tools = _build_vertex_tools(self._tool_declarations)
-                    if vertex_tools:  # Only add if conversion successful
-                        model_kwargs["tools"] = vertex_tools
-                
-                # Note: Google Search grounding in Vertex AI requires additional setup
-                # Skipping for now to avoid compatibility issues
-                
-                self._model = GenerativeModel(**model_kwargs)
+            model = GenerativeModel(**model_kwargs)
+        else:
+            model = genai.GenerativeModel(**model_kwargs)
         
-        return self._model
+        if key is not None:
+            self._store_model(key, model)
+        return model
     
     def register_tool(
         self,
@@ -341,7 +1157,7 @@ class GeminiService:
             parameters: JSON schema for tool parameters
             handler: The function to call when tool is invoked
         """
-        self._tools[name] = handler
+        self._tools[name] = (handler, asyncio.iscoroutinefunction(handler))
         
         # Create function declaration for Gemini
         function_declaration = {
@@ -349,10 +1165,24 @@ class GeminiService:
             "description": description,
             "parameters": parameters,
         }
-        self._tool_declarations.append(function_declaration)
+        replaced = name in self._tool_declarations
+        self._tool_declarations[name] = function_declaration
+        self._tool_declarations_frozen = tuple(self._tool_declarations.values())
+        self._tools_version += 1
+        # Compile SDK tool lists now so requests never convert schemas
+        self._gemini_tools_cache = list(self._tool_declarations_frozen)
+        if not self.use_vertex:
+            self._vertex_tools_cache = None
+        elif self._vertex_tools_cache is None or replaced:
+            self._vertex_tools_cache = _build_vertex_tools(self._tool_declarations_frozen)
+        else:
+            self._vertex_tools_cache = [
+                *self._vertex_tools_cache, *_build_vertex_tools([function_declaration])
+            ]
         
-        # Reset model to include new tools
+        # Reset models to include new tools
         self._model = None
+        self._model_cache.clear()
     
     def register_tools_from_module(self, tool_definitions: List[Dict[str, Any]]):
         """Register multiple tools from a definitions list.
@@ -387,56 +1217,83 @@ class GeminiService:
         Returns:
             Dict with response text, citations, and metadata
         """
+        # Only deterministic, single-turn requests are served from cache
+        if temperature is not None or chat_history:
+            return await self._generate_uncached(
+                prompt, system_instruction, chat_history, temperature
+            )
+        
+        cache_key = hashlib.blake2b(
+            (prompt + (system_instruction or "")).encode(),
+            digest_size=16,
+        ).hexdigest()
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Identical requests already in flight share one upstream call. The
+        # future only lives until that call finishes; keeping the answer
+        # afterwards is left to the TTL-bound response cache.
+        pending = self._inflight.get(cache_key)
+        if pending is not None:
+            try:
+                return copy.deepcopy(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request we were waiting on was cancelled; make our own
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            embedding = None
+            result = None
+            if self.settings.enable_semantic_cache and np is not None:
+                embedding = await self._embed(prompt + (system_instruction or ""))
+                result = self._semantic_lookup(embedding)
+            
+            if result is None:
+                result = await self._generate_uncached(prompt, system_instruction)
+                if result.get("status") == "success":
+                    self._cache_response(cache_key, result, embedding)
+            # The future's result stays pristine; every caller gets a copy
+            future.set_result(result)
+            return copy.deepcopy(result)
+        finally:
+            if not future.done():
+                future.cancel()
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+    
+    async def _generate_uncached(
+        self,
+        prompt: str,
+        system_instruction: Optional[str] = None,
+        chat_history: Optional[List[Dict]] = None,
+        temperature: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Call the API for generate_content, bypassing the response caches."""
         try:
-            # Create model with custom system instruction if provided
+            # Use a cached model for a custom system instruction if provided
             if system_instruction:
-                if self.use_vertex:
-                    GenerativeModel = _safely_import_vertex_class("GenerativeModel")
-                    if not GenerativeModel:
-                        raise RuntimeError(
-                            "Vertex AI GenerativeModel class not available. "
-                            "Install with: pip install google-cloud-aiplatform"
-                        )
-                    tools = _build_vertex_tools(self._tool_declarations) if self._tool_declarations else None
-                    model = GenerativeModel(
-                        model_name=self.settings.gemini_model,
-                        system_instruction=system_instruction,
-                        tools=tools,
-                    )
-                else:
-                    model = genai.GenerativeModel(
-                        model_name=self.settings.gemini_model,
-                        system_instruction=system_instruction,
-                        tools=self._tool_declarations if self._tool_declarations else None,
-                    )
+                model = self._get_or_create_model(system_instruction=system_instruction)
             else:
                 model = self.model
             
             # Build generation config with temperature override
             gen_config = None
             if temperature is not None:
-                if self.use_vertex:
-                    GenerationConfig = _safely_import_vertex_class("GenerationConfig")
-                    if not GenerationConfig:
-                        raise RuntimeError(
-                            "Vertex AI GenerationConfig class not available. "
-                            "Install with: pip install google-cloud-aiplatform"
-                        )
-                    gen_config = GenerationConfig(temperature=temperature)
-                else:
-                    gen_config = genai.GenerationConfig(temperature=temperature)
+                gen_config = _generation_config(self.use_vertex, temperature)
             
             # Handle chat vs single generation
             if chat_history:
                 chat = model.start_chat(history=self._format_history(chat_history))
-                response = await asyncio.to_thread(
-                    chat.send_message,
+                response = await _api_call(chat.send_message_async)(
                     prompt,
                     generation_config=gen_config
                 )
             else:
-                response = await asyncio.to_thread(
-                    model.generate_content,
+                response = await _api_call(model.generate_content_async)(
                     prompt,
                     generation_config=gen_config
                 )
@@ -444,17 +1301,160 @@ class GeminiService:
             # Process response and handle tool calls
             return await self._process_response(response, model, chat_history)
             
-        except Exception as e:
-            return {
-                "status": "error",
-                "error": str(e),
-                "response": None,
-                "citations": [],
-            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": str(e),
+                "response": None,
+                "citations": [],
+            }
+    
+    async def generate_content_batch(
+        self,
+        prompts: List[str],
+        system_instruction: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ) -> List[Any]:
+        """Generate content for several independent prompts concurrently.
+        
+        All requests are submitted up front and collected with
+        asyncio.gather, with at most gemini_max_concurrency in flight.
+        
+        Args:
+            prompts: The user prompts
+            system_instruction: Optional system instruction for every prompt
+            temperature: Optional temperature override
+            
+        Returns:
+            One result per prompt, in order (exceptions are returned in place)
+        """
+        async def _one(prompt: str) -> Dict[str, Any]:
+            async with self._sem:
+                return await self.generate_content(
+                    prompt,
+                    system_instruction=system_instruction,
+                    temperature=temperature,
+                )
+        
+        return await asyncio.gather(
+            *(_one(prompt) for prompt in prompts),
+            return_exceptions=True,
+        )
+    
+    def _cache_response(
+        self,
+        key: str,
+        result: Dict[str, Any],
+        embedding: Optional[Any] = None,
+    ) -> None:
+        """Store a response in the exact (and optionally semantic) cache.
+        
+        Entries expire after response_cache_ttl_seconds, since responses
+        can embed contract data read through tools; a TTL of 0 disables
+        caching.
+        
+        Args:
+            key: Prompt hash
+            result: Response dict to cache
+            embedding: Normalized prompt embedding, if computed
+        """
+        ttl = self.settings.response_cache_ttl_seconds
+        if ttl <= 0:
+            return
+        # Copied so later changes to the caller's dict don't leak in
+        self._exact_cache[key] = (copy.deepcopy(result), time.monotonic() + ttl)
+        self._exact_cache.move_to_end(key)
+        if len(self._exact_cache) > _RESPONSE_CACHE_SIZE:
+            self._exact_cache.popitem(last=False)
+        
+        if embedding is not None:
+            if self._semantic_matrix is None:
+                self._semantic_matrix = np.zeros(
+                    (_RESPONSE_CACHE_SIZE, embedding.shape[0]), dtype=np.float32
+                )
+            # Overwrite the oldest slot once the buffer is full
+            slot = self._semantic_next
+            self._semantic_matrix[slot] = embedding
+            self._semantic_keys[slot] = key
+            self._semantic_next = (slot + 1) % _RESPONSE_CACHE_SIZE
+            self._semantic_size = min(self._semantic_size + 1, _RESPONSE_CACHE_SIZE)
+    
+    def _cached_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a private copy of a cached response, evicting it once expired.
+        
+        Args:
+            key: Prompt hash
+            
+        Returns:
+            Deep copy of the cached response dict, or None on a miss
+        """
+        entry = self._exact_cache.get(key)
+        if entry is None:
+            return None
+        result, expires = entry
+        if expires <= time.monotonic():
+            del self._exact_cache[key]
+            return None
+        self._exact_cache.move_to_end(key)
+        return copy.deepcopy(result)
+    
+    async def _embed(self, text: str):
+        """Compute a normalized embedding for semantic cache lookups.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Unit-length numpy vector, or None if embedding fails
+        """
+        try:
+            if self.use_vertex:
+                embeddings = await _vertex_embedding_model().get_embeddings_async([text])
+                values = embeddings[0].values
+            else:
+                result = await _run_blocking(
+                    genai.embed_content,
+                    model=f"models/{_EMBEDDING_MODEL}",
+                    content=text,
+                )
+                values = result["embedding"]
+            vector = np.asarray(values, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm else None
+        except Exception as e:
+            logger.warning("Semantic cache embedding failed: %s", e)
+            return None
+    
+    def _semantic_lookup(self, embedding) -> Optional[Dict[str, Any]]:
+        """Find a cached response whose prompt is close to the embedding.
+        
+        Args:
+            embedding: Normalized prompt embedding
+            
+        Returns:
+            Cached response dict, or None if nothing is similar enough
+        """
+        if embedding is None or not self._semantic_size:
+            return None
+        
+        scores = self._semantic_matrix[:self._semantic_size] @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.settings.semantic_cache_threshold:
+            return None
+        
+        key = self._semantic_keys[best]
+        cached = self._cached_response(key) if key is not None else None
+        if cached is None:
+            # Evicted or expired; blank the stale slot so it never scores
+            # above the threshold again
+            self._semantic_keys[best] = None
+            self._semantic_matrix[best] = 0.0
+            return None
+        return cached
     
     async def _process_response(
         self,
-        response: GenerateContentResponse,
+        response: "GenerateContentResponse",
         model: Any,
         chat_history: Optional[List[Dict]] = None
     ) -> Dict[str, Any]:
@@ -468,96 +1468,211 @@ class GeminiService:
         Returns:
             Processed response dict
         """
-        # Check for function calls
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if hasattr(part, 'function_call') and part.function_call:
-                    # Execute the function call
-                    function_call = part.function_call
-                    function_name = function_call.name
-                    function_args = dict(function_call.args)
-                    
-                    if function_name in self._tools:
-                        # Execute the tool
-                        tool_result = await self._execute_tool(
-                            function_name, 
-                            function_args
-                        )
-                        
-                        # Send function result back to model
-                        try:
-                            if self.use_vertex:
-                                from vertexai.generative_models import FunctionResponse, Part
-                                function_response = Part(
-                                    function_response=FunctionResponse(
-                                        name=function_name,
-                                        response={"result": json.dumps(tool_result)}
-                                    )
-                                )
-                            else:
-                                function_response = genai.protos.Part(
-                                    function_response=genai.protos.FunctionResponse(
-                                        name=function_name,
-                                        response={"result": json.dumps(tool_result)}
-                                    )
-                                )
-                        except Exception as e:
-                            print(f"❌ Error creating function response: {e}")
-                            raise RuntimeError(
-                                f"Failed to create function response for '{function_name}': {e}"
-                            ) from e
-                        
-                        # Get follow-up response
-                        follow_up = await asyncio.to_thread(
-                            model.generate_content,
-                            [response.candidates[0].content, function_response]
-                        )
-                        
-                        return await self._process_response(
-                            follow_up, model, chat_history
-                        )
-        
-        # Extract text response
-        response_text = ""
-        if response.text:
-            response_text = response.text
-        
-        # Extract citations if available
-        citations = self._extract_citations(response)
+        # Keep answering function calls until the model returns plain text
+        while True:
+            calls = [
+                (name, args)
+                for name, args in _iter_function_calls(response)
+                if name in self._tools
+            ]
+            if not calls:
+                break
+            
+            # Execute all tools requested in this turn concurrently
+            tool_results = await asyncio.gather(*[
+                self._execute_tool(function_name, function_args)
+                for function_name, function_args in calls
+            ])
+            
+            # Send every function result back in a single follow-up
+            function_responses = [
+                self._make_function_response(function_name, tool_result)
+                for (function_name, _), tool_result in zip(calls, tool_results)
+            ]
+            response = await _api_call(model.generate_content_async)(
+                [response.candidates[0].content, *function_responses]
+            )
+        
+        response_text, citations, usage = self._extract_metadata(response)
         
         return {
             "status": "success",
             "response": response_text,
             "citations": citations,
-            "usage": self._extract_usage(response),
+            "usage": usage,
         }
     
+    def _make_function_response(self, function_name: str, tool_result: Any):
+        """Wrap a tool result in a function-response Part for the model.
+        
+        Args:
+            function_name: Name of the tool that was called
+            tool_result: Result returned by the tool
+            
+        Returns:
+            Part for the active backend
+        """
+        # FunctionResponse.response is a Struct, so dicts go through as-is
+        # and only scalars/lists need wrapping
+        response = tool_result if isinstance(tool_result, dict) else {"result": tool_result}
+        try:
+            try:
+                return self._function_response_part(function_name, response)
+            except (TypeError, ValueError):
+                # Values a Struct can't hold (datetimes, Firestore types) fall
+                # back to a single JSON-encoded string
+                return self._function_response_part(
+                    function_name, {"result": _json_dumps(tool_result)}
+                )
+        except Exception as e:
+            logger.error("Error creating function response: %s", e)
+            raise RuntimeError(
+                f"Failed to create function response for '{function_name}': {e}"
+            ) from e
+    
+    def _function_response_part(self, function_name: str, response: Dict[str, Any]):
+        """Build a function-response Part for the active backend."""
+        if self.use_vertex:
+            # vertexai's Part takes no keyword arguments; this is its only
+            # public constructor for function responses
+            return _get_vertex().Part.from_function_response(
+                name=function_name,
+                response=response
+            )
+        return genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=function_name,
+                response=response
+            )
+        )
+    
+    async def stream_content(
+        self,
+        prompt: str,
+        system_instruction: Optional[str] = None,
+        temperature: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Stream generated text as it arrives.
+        
+        Text is yielded chunk by chunk. Function calls in a turn are
+        executed concurrently once that turn's stream ends, and the
+        follow-up response is streamed in turn.
+        
+        Args:
+            prompt: The user prompt
+            system_instruction: Optional system instruction
+            temperature: Optional temperature override
+            metadata: Optional dict filled with "citations" and "usage"
+                as chunks arrive; complete once the stream is exhausted
+            
+        Yields:
+            Text chunks
+        """
+        if system_instruction:
+            model = self._get_or_create_model(system_instruction=system_instruction)
+        else:
+            model = self.model
+        
+        gen_config = None
+        if temperature is not None:
+            gen_config = _generation_config(self.use_vertex, temperature)
+        
+        if metadata is not None:
+            metadata["citations"] = []
+            metadata["usage"] = dict.fromkeys(
+                ("prompt_tokens", "completion_tokens", "total_tokens", "cached_tokens"), 0
+            )
+        
+        contents: Any = prompt
+        while True:
+            stream = await _api_call(model.generate_content_async)(
+                contents,
+                generation_config=gen_config,
+                stream=True,
+            )
+            
+            calls = []
+            call_contents = []
+            turn_usage = None
+            async for chunk in stream:
+                if metadata is not None:
+                    _, citations, usage = self._extract_metadata(chunk)
+                    metadata["citations"].extend(citations)
+                    # Usage on a chunk is cumulative for the turn
+                    if usage["total_tokens"]:
+                        turn_usage = usage
+                if not chunk.candidates:
+                    continue
+                content = chunk.candidates[0].content
+                chunk_calls = [
+                    (fc.name, fc.args)
+                    for part in content.parts
+                    if (fc := getattr(part, 'function_call', None))
+                    and fc.name in self._tools
+                ]
+                if chunk_calls:
+                    calls.extend(chunk_calls)
+                    call_contents.append(content)
+                    continue
+                for part in content.parts:
+                    text = getattr(part, 'text', None)
+                    if text:
+                        yield text
+            
+            if turn_usage is not None:
+                for key, count in turn_usage.items():
+                    metadata["usage"][key] += count or 0
+            
+            if not calls:
+                return
+            
+            # Run every tool requested this turn concurrently, then answer
+            # them all in a single follow-up
+            tool_results = await asyncio.gather(*[
+                self._execute_tool(function_name, function_args)
+                for function_name, function_args in calls
+            ])
+            contents = [
+                *call_contents,
+                *(
+                    self._make_function_response(function_name, tool_result)
+                    for (function_name, _), tool_result in zip(calls, tool_results)
+                ),
+            ]
+    
     async def _execute_tool(
         self,
         tool_name: str,
-        args: Dict[str, Any]
+        args: Mapping[str, Any]
     ) -> Any:
         """Execute a registered tool.
         
         Args:
             tool_name: Name of the tool to execute
-            args: Arguments for the tool
+            args: Arguments for the tool; any mapping (including the SDK's
+                MapComposite) works, since they are only unpacked with **
             
         Returns:
             Tool execution result
         """
-        handler = self._tools.get(tool_name)
-        if handler is None:
+        entry = self._tools.get(tool_name)
+        if entry is None:
             return {"error": f"Tool '{tool_name}' not found"}
         
-        # Check if handler is async
-        if asyncio.iscoroutinefunction(handler):
+        # Async-ness was recorded once at registration
+        handler, is_async = entry
+        if is_async:
             return await handler(**args)
         else:
-            return await asyncio.to_thread(handler, **args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _get_tool_executor(),
+                functools.partial(contextvars.copy_context().run, handler, **args)
+            )
     
     def _format_history(self, chat_history: List[Dict]) -> List[Dict]:
-        """Format chat history for Gemini.
+        """Format the most recent chat history for Gemini.
         
         Args:
             chat_history: List of message dicts with role and content
@@ -565,71 +1680,80 @@ class GeminiService:
         Returns:
             Formatted history for Gemini
         """
-        formatted = []
-        for msg in chat_history:
-            role = "user" if msg.get("role") == "user" else "model"
-            formatted.append({
-                "role": role,
-                "parts": [msg.get("content", "")]
-            })
-        return formatted
+        return [
+            {
+                "role": _ROLE_MAP.get(msg.get("role"), "model"),
+                "parts": [msg.get("content", "")],
+            }
+            for msg in chat_history[-_MAX_HISTORY_MESSAGES:]
+        ]
     
-    def _extract_citations(self, response: GenerateContentResponse) -> List[Dict]:
-        """Extract citations from grounding metadata.
+    def _extract_metadata(
+        self, response: "GenerateContentResponse"
+    ) -> Tuple[str, List[Dict], Dict[str, int]]:
+        """Extract text, citations and token usage in a single pass.
         
-        Args:
-            response: The Gemini response
-            
-        Returns:
-            List of citation dicts with title and uri
-        """
-        citations = []
-        
-        try:
-            if hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
-                
-                # Check for grounding metadata
-                if hasattr(candidate, 'grounding_metadata'):
-                    metadata = candidate.grounding_metadata
-                    
-                    if hasattr(metadata, 'grounding_chunks'):
-                        for chunk in metadata.grounding_chunks:
-                            if hasattr(chunk, 'web'):
-                                citations.append({
-                                    "title": chunk.web.title if hasattr(chunk.web, 'title') else "",
-                                    "uri": chunk.web.uri if hasattr(chunk.web, 'uri') else "",
-                                })
-        except Exception:
-            pass  # Citations are optional, don't fail on errors
-        
-        return citations
-    
-    def _extract_usage(self, response: GenerateContentResponse) -> Dict[str, int]:
-        """Extract token usage from response.
+        Text is joined from the first candidate's text parts, so responses
+        that also carry function calls don't raise like ``response.text``.
         
         Args:
             response: The Gemini response
             
         Returns:
-            Dict with token counts
+            Tuple of (text, citation dicts with title and uri, token counts)
         """
+        text_parts = []
+        citations = []
         usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
             "total_tokens": 0,
+            "cached_tokens": 0,
         }
         
         try:
-            if hasattr(response, 'usage_metadata'):
-                metadata = response.usage_metadata
-                usage["prompt_tokens"] = getattr(metadata, 'prompt_token_count', 0)
-                usage["completion_tokens"] = getattr(metadata, 'candidates_token_count', 0)
-                usage["total_tokens"] = getattr(metadata, 'total_token_count', 0)
-        except Exception:
-            pass
-        
-        return usage
+            candidate = response.candidates[0]
+        except (AttributeError, IndexError, TypeError):
+            candidate = None
+        
+        if candidate is not None:
+            try:
+                parts = candidate.content.parts
+            except AttributeError:
+                parts = ()
+            for part in parts or ():
+                try:
+                    part_text = part.text
+                except (AttributeError, ValueError):
+                    continue  # Non-text part (e.g. a function call)
+                if part_text:
+                    text_parts.append(part_text)
+            
+            # Check for grounding metadata
+            try:
+                chunks = candidate.grounding_metadata.grounding_chunks
+            except AttributeError:
+                chunks = ()
+            for chunk in chunks or ():
+                try:
+                    web = chunk.web
+                    if web:
+                        citations.append({"title": web.title, "uri": web.uri})
+                except AttributeError:
+                    continue
+        
+        try:
+            metadata = response.usage_metadata
+            if metadata:
+                usage["prompt_tokens"] = metadata.prompt_token_count
+                usage["completion_tokens"] = metadata.candidates_token_count
+                usage["total_tokens"] = metadata.total_token_count
+                # Only reported by SDK versions that support context caching
+                usage["cached_tokens"] = getattr(metadata, 'cached_content_token_count', 0)
+        except AttributeError:
+            pass  # Usage is optional, don't fail on older responses
+        
+        return "".join(text_parts), citations, usage
     
     async def generate_with_tools(
         self,
@@ -652,99 +1776,29 @@ class GeminiService:
             Response with text, function_calls, and citations
         """
         try:
-            # Build generation config using appropriate SDK
-            if self.use_vertex:
-                GenerationConfig = _safely_import_vertex_class("GenerationConfig")
-                if not GenerationConfig:
-                    raise RuntimeError(
-                        "Vertex AI GenerationConfig class not available. "
-                        "Install with: pip install google-cloud-aiplatform"
-                    )
-                gen_config = GenerationConfig(
-                    temperature=temperature if temperature is not None else 0.7,
-                )
-            else:
-                gen_config = genai.GenerationConfig(
-                    temperature=temperature if temperature is not None else 0.7,
-                )
-            
-            # Build model kwargs
-            model_kwargs = {
-                "model_name": self.settings.gemini_model,
-                "generation_config": gen_config,
-            }
-            
-            if system_instruction:
-                model_kwargs["system_instruction"] = system_instruction
-            
-            # Convert tools to SDK-specific format
-            model_tools = []
-            if tools:
-                if self.use_vertex:
-                    model_tools = _build_vertex_tools(tools)
-                else:
-                    for tool in tools:
-                        func_decl = {
-                            "name": tool["name"],
-                            "description": tool["description"],
-                        }
-                        if "parameters" in tool:
-                            func_decl["parameters"] = _convert_json_schema_to_gemini(tool["parameters"])
-                        model_tools.append(func_decl)
-            
-            if use_search_grounding:
-                if self.use_vertex:
-                    try:
-                        Tool = _safely_import_vertex_class("Tool")
-                        GoogleSearchRetrieval = _safely_import_vertex_class("GoogleSearchRetrieval")
-                        if Tool and GoogleSearchRetrieval:
-                            model_tools.append(Tool(google_search_retrieval=GoogleSearchRetrieval()))
-                    except Exception as e:
-                        print(f"⚠️ GoogleSearchRetrieval not available: {e}")
-                else:
-                    try:
-                        from google.generativeai.types import Tool
-                        model_tools.append(Tool.from_google_search_retrieval())
-                    except Exception as e:
-                        print(f"⚠️ Google Search not available: {e}")
-            
-            if model_tools:
-                model_kwargs["tools"] = model_tools
+            gen_config = _generation_config(
+                self.use_vertex, temperature if temperature is not None else 0.7
+            )
             
-            # Use appropriate SDK based on configuration
-            if self.use_vertex:
-                GenerativeModel = _safely_import_vertex_class("GenerativeModel")
-                if not GenerativeModel:
-                    raise RuntimeError(
-                        "Vertex AI GenerativeModel class not available. "
-                        "Install with: pip install google-cloud-aiplatform"
-                    )
-                model = GenerativeModel(**model_kwargs)
-            else:
-                model = genai.GenerativeModel(**model_kwargs)
+            model = self._get_tools_model(
+                system_instruction=system_instruction,
+                tools=tools,
+                use_search_grounding=use_search_grounding,
+            )
             
             # Generate content
-            response = await asyncio.to_thread(
-                model.generate_content,
-                prompt
+            response = await _api_call(model.generate_content_async)(
+                prompt,
+                generation_config=gen_config,
             )
             
             # Extract function calls
-            function_calls = []
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'function_call') and part.function_call:
-                        fc = part.function_call
-                        function_calls.append({
-                            "name": fc.name,
-                            "arguments": dict(fc.args) if fc.args else {},
-                        })
+            function_calls = [
+                {"name": name, "arguments": dict(args) if args else {}}
+                for name, args in _iter_function_calls(response)
+            ]
             
-            # Extract text
-            text = response.text if hasattr(response, 'text') and response.text else ""
-            
-            # Extract citations
-            citations = self._extract_citations(response)
+            text, citations, _ = self._extract_metadata(response)
             
             return {
                 "text": text,
@@ -754,9 +1808,7 @@ class GeminiService:
             }
             
         except Exception as e:
-            print(f"Error in generate_with_tools: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Error in generate_with_tools: %s", e, exc_info=True)
             return {
                 "text": f"Error: {str(e)}",
                 "function_calls": [],
@@ -780,87 +1832,33 @@ class GeminiService:
             Response with text, function_calls, citations
         """
         try:
-            # Build generation config using appropriate SDK
-            if self.use_vertex:
-                from vertexai.generative_models import GenerationConfig
-                gen_config = GenerationConfig(temperature=0.7)
-            else:
-                gen_config = genai.GenerationConfig(temperature=0.7)
-            
-            # Build model
-            model_kwargs = {
-                "model_name": self.settings.gemini_model,
-                "generation_config": gen_config,
-            }
-            
-            if system_instruction:
-                model_kwargs["system_instruction"] = system_instruction
-            
-            # Convert tools to SDK-specific format
-            if tools:
-                if self.use_vertex:
-                    model_kwargs["tools"] = _build_vertex_tools(tools)
-                else:
-                    model_tools = []
-                    for tool in tools:
-                        func_decl = {
-                            "name": tool["name"],
-                            "description": tool["description"],
-                        }
-                        if "parameters" in tool:
-                            func_decl["parameters"] = _convert_json_schema_to_gemini(tool["parameters"])
-                        model_tools.append(func_decl)
-                    model_kwargs["tools"] = model_tools
+            gen_config = _generation_config(self.use_vertex, 0.7)
             
-            if self.use_vertex:
-                from vertexai.generative_models import GenerativeModel
-                model = GenerativeModel(**model_kwargs)
-            else:
-                model = genai.GenerativeModel(**model_kwargs)
+            model = self._get_tools_model(
+                system_instruction=system_instruction,
+                tools=tools,
+            )
             
-            # Build function response parts
-            response_parts = []
-            for fr in function_results:
-                if self.use_vertex:
-                    from vertexai.generative_models import Part, FunctionResponse
-                    response_parts.append(
-                        Part.from_function_response(
-                            name=fr["name"],
-                            response={"result": json.dumps(fr["result"])}
-                        )
-                    )
-                else:
-                    response_parts.append(
-                        genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=fr["name"],
-                                response={"result": json.dumps(fr["result"])}
-                            )
-                        )
-                    )
+            # Build function response parts; results go in structured rather
+            # than as a JSON string the SDK would then encode a second time
+            response_parts = [
+                self._make_function_response(fr["name"], fr["result"])
+                for fr in function_results
+            ]
             
             # Generate follow-up
-            response = await asyncio.to_thread(
-                model.generate_content,
-                response_parts
+            response = await _api_call(model.generate_content_async)(
+                response_parts,
+                generation_config=gen_config,
             )
             
             # Extract function calls
-            function_calls = []
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'function_call') and part.function_call:
-                        fc = part.function_call
-                        function_calls.append({
-                            "name": fc.name,
-                            "arguments": dict(fc.args) if fc.args else {},
-                        })
+            function_calls = [
+                {"name": name, "arguments": dict(args) if args else {}}
+                for name, args in _iter_function_calls(response)
+            ]
             
-            # Extract text
-            text = response.text if hasattr(response, 'text') and response.text else ""
-            
-            # Extract citations
-            citations = self._extract_citations(response)
+            text, citations, _ = self._extract_metadata(response)
             
             return {
                 "text": text,
@@ -869,9 +1867,7 @@ class GeminiService:
             }
             
         except Exception as e:
-            print(f"Error in continue_with_function_results: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Error in continue_with_function_results: %s", e, exc_info=True)
             return {
                 "text": f"Error: {str(e)}",
                 "function_calls": [],
@@ -883,6 +1879,7 @@ class GeminiService:
         prompt: str,
         response_schema: Dict[str, Any],
         system_instruction: Optional[str] = None,
+        validate: bool = False,
     ) -> Dict[str, Any]:
         """Generate structured JSON output using response schema.
         
@@ -890,47 +1887,35 @@ class GeminiService:
             prompt: The user prompt
             response_schema: JSON schema for the expected response
             system_instruction: Optional system instruction
+            validate: Check the parsed response against response_schema
+                (skipped when fastjsonschema isn't installed)
             
         Returns:
             Parsed JSON response
         """
         try:
-            if self.use_vertex:
-                from vertexai.generative_models import GenerationConfig
-                generation_config = GenerationConfig(
-                    response_mime_type="application/json",
-                    response_schema=response_schema,
-                )
-            else:
-                generation_config = genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    response_schema=response_schema,
-                )
-            
-            if self.use_vertex:
-                from vertexai.generative_models import GenerativeModel
-                model = GenerativeModel(
-                    model_name=self.settings.gemini_model,
-                    system_instruction=system_instruction,
-                    generation_config=generation_config,
-                )
-            else:
-                model = genai.GenerativeModel(
-                    model_name=self.settings.gemini_model,
-                    system_instruction=system_instruction,
-                    generation_config=generation_config,
-                )
-            
-            response = await asyncio.to_thread(
-                model.generate_content,
-                prompt
+            model = self._get_or_create_model(
+                system_instruction=system_instruction,
+                response_schema=response_schema,
             )
             
+            response = await _api_call(model.generate_content_async)(prompt)
+            
             # Parse JSON response
             if response.text:
+                data = _json_loads(response.text)
+                validator = _schema_validator(response_schema) if validate else None
+                if validator is not None:
+                    try:
+                        validator(data)
+                    except fastjsonschema.JsonSchemaValueException as e:
+                        return {
+                            "status": "error",
+                            "error": f"Response does not match schema: {e.message}",
+                        }
                 return {
                     "status": "success",
-                    "data": json.loads(response.text),
+                    "data": data,
                 }
             
             return {
@@ -938,7 +1923,8 @@ class GeminiService:
                 "error": "No response generated",
             }
             
-        except json.JSONDecodeError as e:
+        except ValueError as e:
+            # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
             return {
                 "status": "error",
                 "error": f"Failed to parse JSON response: {e}",
@@ -951,74 +1937,310 @@ class GeminiService:
     
     async def analyze_document(
         self,
-        content: str,
+        content: Union[str, List[str]],
         analysis_type: str,
         additional_context: Optional[str] = None,
-    ) -> Dict[str, Any]:
+        stream: bool = False,
+    ) -> Union[Dict[str, Any], List[Any], AsyncIterator[str]]:
         """Analyze a document with specific analysis type.
         
         Args:
-            content: The document content
+            content: The document content, or a list of chunks to analyze
+                concurrently
             analysis_type: Type of analysis (e.g., 'contract', 'risk', 'compliance')
             additional_context: Optional additional context
+            stream: Return an async iterator of text chunks instead of
+                waiting for the full analysis (single documents only)
             
         Returns:
-            Analysis results
+            Analysis results (one per chunk when a list is given), or a
+            text chunk iterator when stream is set
+            
+        Raises:
+            ValueError: If a document must be split but additional_context
+                leaves too little room for it in each request
         """
-        prompts = {
-            "contract": """Analyze this contract and extract:
-                1. Contract type
-                2. Parties involved
-                3. Key terms and dates
-                4. Obligations for each party
-                5. Termination conditions
-                
-                Contract content:
-                {content}
-                
-                {additional_context}
-                
-                Provide a structured analysis.""",
+        template = _ANALYSIS_TEMPLATES.get(analysis_type, _ANALYSIS_TEMPLATES["contract"])
+        context = additional_context or ""
+        
+        if isinstance(content, list):
+            if stream:
+                raise ValueError("stream=True requires a single document")
+            return await self.batch_analyze(content, analysis_type, additional_context)
+        
+        if stream:
+            prompt = await _render_prompt(template, content, context)
+            return self.stream_content(prompt)
+        
+        # Inputs that can't fit are split and analyzed in parallel rather
+        # than sent whole only to be rejected by the API
+        budget = self._content_budget(analysis_type, context)
+        if _estimate_tokens(content) > budget:
+            if budget < _MIN_SPLIT_TOKENS:
+                raise ValueError(
+                    f"additional_context (~{_estimate_tokens(context)} tokens) leaves "
+                    f"room for only {max(budget, 0)} document tokens per request; "
+                    f"shorten it so at least {_MIN_SPLIT_TOKENS} remain"
+                )
+            chunks = _split_content(content, budget * 4)
+            results = await self.generate_content_batch([
+                _fill_template(template, chunk, context)
+                for chunk in chunks
+            ])
+            return self._merge_results(results)
+        
+        # Large documents are uploaded once as cached context; only the
+        # analysis instructions are sent on each call
+        cached_model = await self._get_cached_content_model(content)
+        if cached_model is not None:
+            prompt = _fill_template(template, "(provided in the cached context)", context)
+            try:
+                response = await _api_call(cached_model.generate_content_async)(prompt)
+                return await self._process_response(response, cached_model)
+            except Exception as e:
+                logger.warning("Cached-context analysis failed, sending full document: %s", e)
+        
+        prompt = await _render_prompt(template, content, context)
+        
+        return await self.generate_content(prompt)
+    
+    async def batch_analyze(
+        self,
+        documents: List[str],
+        analysis_type: str,
+        additional_context: Optional[str] = None,
+    ) -> List[Any]:
+        """Analyze several documents concurrently.
+        
+        Documents that fit in one request are sent together through
+        generate_content_batch, so at most gemini_max_concurrency calls are
+        in flight. Oversized documents go through analyze_document, which
+        splits them.
+        
+        Args:
+            documents: The documents to analyze
+            analysis_type: Type of analysis (e.g., 'contract', 'risk', 'compliance')
+            additional_context: Optional additional context for every document
             
-            "risk": """Analyze this document for legal risks:
-                1. Identify potentially problematic clauses
-                2. Flag ambiguous language
-                3. Note missing standard protections
-                4. Assess liability exposure
-                5. Rate each risk (low/medium/high/critical)
-                
-                Document content:
-                {content}
-                
-                {additional_context}
-                
-                Provide detailed risk assessment.""",
+        Returns:
+            One result per document, in order (exceptions are returned in place)
+        """
+        template = _ANALYSIS_TEMPLATES.get(analysis_type, _ANALYSIS_TEMPLATES["contract"])
+        context = additional_context or ""
+        budget = self._content_budget(analysis_type, context)
+        
+        fits = [i for i, doc in enumerate(documents) if _estimate_tokens(doc) <= budget]
+        oversized = [i for i, doc in enumerate(documents) if _estimate_tokens(doc) > budget]
+        
+        async def _batch() -> List[Any]:
+            prompts = await asyncio.gather(*[
+                _render_prompt(template, documents[i], context) for i in fits
+            ])
+            return await self.generate_content_batch(list(prompts))
+        
+        batch_results, split_results = await asyncio.gather(
+            _batch(),
+            asyncio.gather(
+                *(
+                    self.analyze_document(documents[i], analysis_type, additional_context)
+                    for i in oversized
+                ),
+                return_exceptions=True,
+            ),
+        )
+        
+        results: List[Any] = [None] * len(documents)
+        for i, result in zip(fits, batch_results):
+            results[i] = result
+        for i, result in zip(oversized, split_results):
+            results[i] = result
+        return results
+    
+    async def analyze_documents_marshaled(
+        self,
+        documents: List[str],
+        analysis_type: str,
+        additional_context: Optional[str] = None,
+        rows_per_call: int = 4,
+    ) -> List[Any]:
+        """Analyze many short documents, several per request.
+        
+        Documents are grouped rows_per_call at a time into one numbered
+        prompt, and the model returns a JSON array with one analysis per
+        document. This issues len(documents) / rows_per_call requests, which
+        helps when the per-minute request quota is the bottleneck. A group
+        whose response can't be matched to its documents is re-analyzed
+        one document per request.
+        
+        Args:
+            documents: The documents to analyze
+            analysis_type: Type of analysis (e.g., 'contract', 'risk', 'compliance')
+            additional_context: Optional additional context for every document
+            rows_per_call: How many documents to send in each request
             
-            "compliance": """Analyze this document for regulatory compliance:
-                1. Check GDPR compliance (if applicable)
-                2. Check industry-specific regulations
-                3. Identify non-compliant sections
-                4. Recommend changes for compliance
-                
-                Document content:
-                {content}
-                
-                {additional_context}
-                
-                Provide compliance assessment.""",
+        Returns:
+            One result per document, in order (exceptions are returned in place)
+        """
+        template = _ANALYSIS_TEMPLATES.get(analysis_type, _ANALYSIS_TEMPLATES["contract"])
+        context = additional_context or ""
+        rows_per_call = max(rows_per_call, 1)
+        
+        async def _group(group: List[str]) -> List[Any]:
+            body = "\n".join(
+                f"=== DOCUMENT {i} ===\n{doc}" for i, doc in enumerate(group, 1)
+            )
+            prompt = await _render_prompt(template, body, context)
+            async with self._sem:
+                result = await self.generate_structured_output(
+                    prompt + _MARSHALED_INSTRUCTIONS,
+                    response_schema=_MARSHALED_SCHEMA,
+                )
+            
+            rows = result.get("data") if result.get("status") == "success" else None
+            analyses = _marshaled_analyses(rows, len(group))
+            if analyses is None:
+                return await self.batch_analyze(group, analysis_type, additional_context)
+            return [
+                {"status": "success", "response": analysis, "citations": []}
+                for analysis in analyses
+            ]
+        
+        groups = await asyncio.gather(*[
+            _group(documents[i:i + rows_per_call])
+            for i in range(0, len(documents), rows_per_call)
+        ])
+        return [result for group in groups for result in group]
+    
+    def _content_budget(self, analysis_type: str, context: str) -> int:
+        """Estimate how many document tokens fit alongside the prompt template."""
+        overhead = _TEMPLATE_TOKENS.get(analysis_type, _TEMPLATE_TOKENS["contract"])
+        overhead += _estimate_tokens(context)
+        return self.settings.gemini_max_input_tokens - overhead
+    
+    def _merge_results(self, results: List[Any]) -> Dict[str, Any]:
+        """Merge per-chunk generate_content results into one response.
+        
+        Args:
+            results: Results from generate_content_batch
+            
+        Returns:
+            Combined response dict
+        """
+        responses = []
+        citations = []
+        usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "cached_tokens": 0,
         }
+        errors = []
+        for result in results:
+            if isinstance(result, Exception):
+                errors.append(str(result))
+                continue
+            if result.get("status") != "success":
+                errors.append(result.get("error", "Unknown error"))
+                continue
+            responses.append(result.get("response") or "")
+            citations.extend(result.get("citations", []))
+            for key, value in result.get("usage", {}).items():
+                usage[key] = usage.get(key, 0) + (value or 0)
         
-        prompt_template = prompts.get(analysis_type, prompts["contract"])
-        prompt = prompt_template.format(
-            content=content,
-            additional_context=additional_context or ""
-        )
+        if not responses:
+            return {
+                "status": "error",
+                "error": "; ".join(errors) or "No response generated",
+                "response": None,
+                "citations": [],
+            }
         
-        return await self.generate_content(prompt)
+        merged = {
+            "status": "success",
+            "response": "\n\n".join(responses),
+            "citations": citations,
+            "usage": usage,
+            "chunks": len(results),
+        }
+        if errors:
+            merged["errors"] = errors
+        return merged
+    
+    async def _get_cached_content_model(self, content: str):
+        """Get a model bound to an explicit context cache for a document.
+        
+        Args:
+            content: The document content
+            
+        Returns:
+            Model reading from the cached document, or None when the
+            document is too small or caching is unavailable
+        """
+        if self._content_cache_disabled or _estimate_tokens(content) < _CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        
+        key = hashlib.sha256(content.encode()).hexdigest()
+        entry = self._content_cache.get(key)
+        now = time.monotonic()
+        
+        try:
+            if entry is None or entry[1] <= now:
+                if self.use_vertex:
+                    from vertexai.preview import caching
+                    cached = await _run_blocking(
+                        caching.CachedContent.create,
+                        model_name=self.settings.gemini_model,
+                        contents=[content],
+                        ttl=_CONTEXT_CACHE_TTL,
+                    )
+                else:
+                    cached = await _run_blocking(
+                        genai.caching.CachedContent.create,
+                        model=self.settings.gemini_model,
+                        contents=[content],
+                        ttl=_CONTEXT_CACHE_TTL,
+                    )
+                # Expire locally a little before the server does
+                entry = (cached, now + _CONTEXT_CACHE_TTL.total_seconds() - 30)
+                self._store_content_cache(key, entry, now)
+            elif entry[0] is None:
+                # Creation failed recently; don't hammer the API
+                return None
+            else:
+                self._content_cache.move_to_end(key)
+            
+            if self.use_vertex:
+                from vertexai.preview.generative_models import GenerativeModel
+                return GenerativeModel.from_cached_content(cached_content=entry[0])
+            return genai.GenerativeModel.from_cached_content(cached_content=entry[0])
+        except _CONTEXT_CACHE_FATAL_ERRORS as e:
+            logger.warning("Context caching disabled: %s", e)
+            self._content_cache_disabled = True
+            self._content_cache.clear()
+            return None
+        except Exception as e:
+            logger.warning("Context caching not available: %s", e)
+            self._store_content_cache(key, (None, now + _CONTEXT_CACHE_RETRY_AFTER), now)
+            return None
+    
+    def _store_content_cache(self, key: str, entry: Tuple[Any, float], now: float) -> None:
+        """Cache a document handle, dropping expired and least recently used entries."""
+        cache = self._content_cache
+        for stale in [k for k, (_, expires) in cache.items() if expires <= now]:
+            del cache[stale]
+        cache[key] = entry
+        cache.move_to_end(key)
+        while len(cache) > _CONTEXT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+# Singleton instance
+_INSTANCE: Optional[GeminiService] = None
 
 
-# Create singleton instance
-@lru_cache()
 def get_gemini_service() -> GeminiService:
     """Get the singleton Gemini service instance."""
-    return GeminiService()
+    global _INSTANCE
+    if _INSTANCE is None:
+        _INSTANCE = GeminiService()
+    return _INSTANCE
@@ -0,0 +1,8 @@
+"""Shared pytest setup for the backend test suite."""
+
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
@@ -0,0 +1,45 @@
+"""Retry behaviour of the legacy service's _api_call wrapper."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.api_core")
+pytest.importorskip("pydantic_settings")
+
+from google.api_core import exceptions as google_exceptions
+
+from services import gemini_service_old
+
+
+@pytest.fixture(autouse=True)
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(gemini_service_old, "_RATE_LIMITER", False)
+
+
+def test_transient_error_is_retried():
+    calls = []
+
+    async def flaky(value):
+        calls.append(value)
+        if len(calls) == 1:
+            raise google_exceptions.ServiceUnavailable("try again")
+        return value
+
+    result = asyncio.run(gemini_service_old._api_call(flaky)("ok"))
+
+    assert result == "ok"
+    assert calls == ["ok", "ok"]
+
+
+def test_client_error_is_not_retried():
+    calls = []
+
+    async def invalid():
+        calls.append(1)
+        raise google_exceptions.InvalidArgument("bad request")
+
+    with pytest.raises(google_exceptions.InvalidArgument):
+        asyncio.run(gemini_service_old._api_call(invalid)())
+
+    assert calls == [1]
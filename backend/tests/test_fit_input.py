@@ -0,0 +1,47 @@
+"""Prompt-size trimming in the Vertex AI Gemini service."""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("vertexai")
+pytest.importorskip("pydantic_settings")
+
+from services.gemini_service import (
+    GeminiService,
+    _MAX_OUTPUT_TOKENS,
+    _TRUNCATION_MARKER,
+    _truncate_middle,
+)
+
+
+def test_short_text_is_unchanged():
+    assert _truncate_middle("short", 100) == "short"
+
+
+def test_keeps_head_and_tail():
+    text = "H" * 50 + "M" * 100 + "T" * 50
+    limit = 60 + len(_TRUNCATION_MARKER)
+
+    result = _truncate_middle(text, limit)
+
+    assert len(result) == limit
+    assert result == "H" * 30 + _TRUNCATION_MARKER + "T" * 30
+
+
+def test_limit_smaller_than_marker():
+    text = "x" * 100
+
+    assert _truncate_middle(text, len(_TRUNCATION_MARKER) - 1) == "x" * (len(_TRUNCATION_MARKER) - 1)
+    assert _truncate_middle(text, 0) == ""
+
+
+def test_fit_input_reserves_template_and_output():
+    service = GeminiService.__new__(GeminiService)
+    service.settings = SimpleNamespace(gemini_max_input_tokens=_MAX_OUTPUT_TOKENS + 100)
+    template = "Summarize:\n{text}\nDone."
+
+    prompt = service._fit_input(template, "d" * 10_000)
+
+    assert len(prompt) == 100 * 4
+    assert prompt.startswith("Summarize:\n") and prompt.endswith("\nDone.")
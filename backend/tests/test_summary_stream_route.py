@@ -0,0 +1,84 @@
+"""Route tests for GET /contracts/{contract_id}/summary/stream."""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("google.cloud.firestore")
+pytest.importorskip("vertexai")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import endpoints_new
+
+
+class _FakeFirestore:
+    contracts = {"c1": {"id": "c1", "content": "The parties agree..."}}
+
+    async def get_contract(self, contract_id):
+        return self.contracts.get(contract_id)
+
+
+class _FakeGemini:
+    # Raise after this many chunks; None streams the whole summary
+    fail_after = None
+
+    async def summarize_stream(self, text, max_length=None):
+        for sent, chunk in enumerate(["Summary of ", text]):
+            if sent == self.fail_after:
+                raise RuntimeError("model unavailable")
+            yield chunk
+
+
+@pytest.fixture
+def gemini():
+    return _FakeGemini()
+
+
+@pytest.fixture
+def client(monkeypatch, gemini):
+    monkeypatch.setattr(endpoints_new, "FirestoreService", _FakeFirestore)
+    monkeypatch.setattr(
+        endpoints_new,
+        "get_chatbot_manager",
+        lambda: SimpleNamespace(gemini=gemini),
+    )
+    endpoints_new._rate_limit_store.clear()
+    app = FastAPI()
+    app.include_router(endpoints_new.router)
+    app.dependency_overrides[endpoints_new.verify_api_key] = lambda: None
+    return TestClient(app)
+
+
+def test_streams_summary(client):
+    response = client.get("/contracts/c1/summary/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text == "Summary of The parties agree..."
+
+
+def test_unknown_contract_is_404(client):
+    response = client.get("/contracts/missing/summary/stream")
+
+    assert response.status_code == 404
+
+
+def test_failure_before_first_chunk_is_500(client, gemini):
+    gemini.fail_after = 0
+
+    response = client.get("/contracts/c1/summary/stream")
+
+    assert response.status_code == 500
+
+
+def test_failure_mid_stream_ends_with_marker(client, gemini):
+    gemini.fail_after = 1
+
+    response = client.get("/contracts/c1/summary/stream")
+
+    assert response.status_code == 200
+    assert response.text == "Summary of " + endpoints_new._STREAM_ERROR_MARKER
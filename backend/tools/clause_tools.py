@@ -89,25 +89,11 @@ async def extract_clauses(
             "content": section_text[:1000],
         })
     
-    # Save clauses to Firestore
-    clause_ids = []
-    for clause in extracted_clauses:
-        clause_id = await firestore.create_clause(
-            contract_id=contract_id,
-            clause_type=clause["clause_type"],
-            content=clause["content"],
-            section_number=clause["section_number"],
-        )
-        clause_ids.append(clause_id)
+    # Save clauses and link them to the contract in one commit
+    clause_ids = await firestore.save_clauses(contract_id, extracted_clauses)
+    for clause, clause_id in zip(extracted_clauses, clause_ids):
         clause["id"] = clause_id
     
-    # Update contract with clause IDs
-    await firestore.update_document(
-        firestore.CONTRACTS,
-        contract_id,
-        {"clauses": clause_ids}
-    )
-    
     return {
         "status": "success",
         "clauses": extracted_clauses,
@@ -105,12 +105,13 @@ async def extract_contract_text(contract_id: str) -> Dict[str, Any]:
         pdf_bytes = await storage.download_file(file_url)
         
         # Extract text using pdfplumber (better quality)
-        text_content = ""
+        page_texts = []
         with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
             for page in pdf.pages:
                 page_text = page.extract_text()
                 if page_text:
-                    text_content += page_text + "\n\n"
+                    page_texts.append(page_text)
+        text_content = "\n\n".join(page_texts) + "\n\n" if page_texts else ""
         
         # Update contract with extracted content
         await firestore.update_document(